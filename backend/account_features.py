@@ -0,0 +1,288 @@
+# backend/account_features.py
+"""
+Per-account behavioral feature store.
+
+Holds one row of graph features per account (degrees, distinct
+counterparties, amount totals, recent amount sums and cycle participation),
+so /predict can join them to a transaction with a constant-time lookup
+instead of scanning the account's transactions.
+
+The store is built once from the edge columns with vectorized passes and
+then maintained incrementally: graph_analysis.ingest_transactions calls
+record() for every appended transaction.
+
+"Recent" amount sums are exponentially decayed by transaction time: a
+contribution loses half its weight every RECENT_HALF_LIFE seconds. That
+keeps a rolling sum in O(1) state per account, with no per-account window
+buffer. Sums are reported as of the latest transaction time the store has
+seen, not the wall clock, so a store built from historical data is not
+decayed to nothing.
+
+Cycle participation is seeded from the typology sweep table when one exists
+(python -m backend.typology_sweep), and incremented for every account on a
+cycle closed by an ingested transaction.
+
+Precompute and save the store next to the column store:
+    python -m backend.account_features
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FEATURES = [
+    'out_degree', 'in_degree',
+    'out_counterparties', 'in_counterparties',
+    'out_amount', 'in_amount',
+    'out_amount_recent', 'in_amount_recent',
+    'cycle_count'
+]
+COUNT_FEATURES = ['out_degree', 'in_degree', 'out_counterparties', 'in_counterparties', 'cycle_count']
+# Internal decay clocks: the transaction time (Unix seconds) each recent sum was last aged to
+CLOCKS = ['out_recent_time', 'in_recent_time']
+COLUMNS = FEATURES + CLOCKS
+_COL = {name: i for i, name in enumerate(COLUMNS)}
+
+RECENT_HALF_LIFE = 7 * 24 * 3600  # seconds
+CYCLE_SEED_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'suspicious_accounts.csv')
+FEATURES_DIR = 'features'
+MANIFEST_FILE = 'features.json'
+MIN_CAPACITY = 1024
+# A dense ID -> slot table is used while it is at most this many times larger than the account count
+DENSE_SLOT_FACTOR = 8
+
+
+def _decay(seconds):
+    return np.exp2(-np.asarray(seconds, dtype=np.float64) / RECENT_HALF_LIFE)
+
+
+class AccountFeatureStore:
+    """
+    Feature matrix with one row per account and O(1) lookup by account ID.
+
+    Slots are found through a dense int32 table indexed by account ID when
+    the IDs are compact non-negative integers, and through a dict otherwise
+    (and for new IDs beyond the table). The matrix doubles its capacity when
+    new accounts arrive.
+    """
+
+    def __init__(self, account_ids, values, clock, now):
+        self.clock = int(clock)  # transactions folded in
+        self.now = int(now)  # latest transaction time folded in
+        self._size = len(account_ids)
+        self._values = np.zeros((max(self._size, MIN_CAPACITY), len(COLUMNS)), dtype=np.float64)
+        self._values[:self._size] = values
+        self._dense = None
+        self._extra = {}
+        account_ids = np.asarray(account_ids, dtype=np.int64)
+        if self._size and account_ids.min() >= 0 and account_ids.max() < DENSE_SLOT_FACTOR * self._size:
+            self._dense = np.full(int(account_ids.max()) + 1, -1, dtype=np.int32)
+            self._dense[account_ids] = np.arange(self._size, dtype=np.int32)
+        else:
+            self._extra = dict(zip(account_ids.tolist(), range(self._size)))
+
+    # --- Building and persistence ---
+
+    @classmethod
+    def build(cls, senders, receivers, amounts, timestamps, cycle_counts=None):
+        """Computes every feature over the full edge columns in vectorized passes."""
+        senders = np.asarray(senders, dtype=np.int64)
+        receivers = np.asarray(receivers, dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        n = len(senders)
+        now = int(timestamps.max()) if n else 0
+
+        account_ids, inverse = np.unique(np.concatenate([senders, receivers]), return_inverse=True)
+        sender_slots, receiver_slots = inverse[:n], inverse[n:]
+        size = len(account_ids)
+        values = np.zeros((size, len(COLUMNS)), dtype=np.float64)
+
+        def count(slots, weights=None):
+            return np.bincount(slots, weights=weights, minlength=size)
+
+        values[:, _COL['out_degree']] = count(sender_slots)
+        values[:, _COL['in_degree']] = count(receiver_slots)
+        values[:, _COL['out_amount']] = count(sender_slots, amounts)
+        values[:, _COL['in_amount']] = count(receiver_slots, amounts)
+
+        # Distinct counterparties: count each (sender, receiver) pair once
+        pairs = np.unique(sender_slots * size + receiver_slots)
+        values[:, _COL['out_counterparties']] = count(pairs // size)
+        values[:, _COL['in_counterparties']] = count(pairs % size)
+
+        # Recent sums, aged to the latest transaction time
+        recent = amounts * _decay(now - timestamps)
+        values[:, _COL['out_amount_recent']] = count(sender_slots, recent)
+        values[:, _COL['in_amount_recent']] = count(receiver_slots, recent)
+        values[:, _COL['out_recent_time']] = now
+        values[:, _COL['in_recent_time']] = now
+
+        if cycle_counts is not None and len(cycle_counts):
+            ids = cycle_counts['account_id'].to_numpy(dtype=np.int64)
+            slots = np.searchsorted(account_ids, ids)
+            known = (slots < size) & (account_ids[np.minimum(slots, size - 1)] == ids)
+            values[slots[known], _COL['cycle_count']] = cycle_counts['cycle_count'].to_numpy()[known]
+
+        return cls(account_ids, values, clock=n, now=now)
+
+    @classmethod
+    def load(cls, directory):
+        """Opens a store saved by save(); the arrays are copied because the store is updated in place."""
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        account_ids = np.load(os.path.join(directory, 'account_ids.npy'))
+        values = np.load(os.path.join(directory, 'values.npy'))
+        return cls(account_ids, values, clock=manifest['clock'], now=manifest['now'])
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'account_ids.npy'), self.account_ids())
+        np.save(os.path.join(directory, 'values.npy'), self._values[:self._size])
+        # Written last: its presence marks the saved store as complete
+        with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+            json.dump({'clock': self.clock, 'now': self.now, 'columns': COLUMNS}, f)
+
+    @staticmethod
+    def saved_clock(directory):
+        """Transaction count a saved store covers, or None if nothing is saved."""
+        path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            manifest = json.load(f)
+        return manifest['clock'] if manifest.get('columns') == COLUMNS else None
+
+    # --- Slots ---
+
+    def _slot(self, account_id):
+        if self._dense is not None and 0 <= account_id < len(self._dense):
+            slot = int(self._dense[account_id])
+            return slot if slot >= 0 else None
+        return self._extra.get(account_id)
+
+    def _add_account(self, account_id):
+        if self._size == len(self._values):
+            grown = np.zeros((2 * self._size, len(COLUMNS)), dtype=np.float64)
+            grown[:self._size] = self._values[:self._size]
+            self._values = grown
+        slot = self._size
+        self._values[slot, _COL['out_recent_time']] = self.now
+        self._values[slot, _COL['in_recent_time']] = self.now
+        self._size += 1
+        if self._dense is not None and 0 <= account_id < len(self._dense):
+            self._dense[account_id] = slot
+        else:
+            self._extra[account_id] = slot
+        return slot
+
+    def account_ids(self):
+        """Account ID of every slot, in slot order."""
+        ids = np.empty(self._size, dtype=np.int64)
+        if self._dense is not None:
+            known = np.flatnonzero(self._dense >= 0)
+            ids[self._dense[known]] = known
+        for account_id, slot in self._extra.items():
+            ids[slot] = account_id
+        return ids
+
+    # --- Incremental maintenance and lookup ---
+
+    def record(self, sender, receiver, amount, new_pair, timestamp):
+        """
+        Folds one appended transaction, made at `timestamp` (Unix seconds),
+        into both accounts' features.
+
+        `new_pair` says whether this is the first transfer from sender to
+        receiver, which is what the counterparty counts track.
+        """
+        s = self._slot(sender)
+        if s is None:
+            s = self._add_account(sender)
+        r = self._slot(receiver)
+        if r is None:
+            r = self._add_account(receiver)
+        row = self._values  # read after any growth above
+
+        row[s, _COL['out_degree']] += 1
+        row[r, _COL['in_degree']] += 1
+        row[s, _COL['out_amount']] += amount
+        row[r, _COL['in_amount']] += amount
+        if new_pair:
+            row[s, _COL['out_counterparties']] += 1
+            row[r, _COL['in_counterparties']] += 1
+
+        # Age each recent sum to the later of its time and the transaction's, then
+        # add the transaction aged the same way (it may be older than the sum)
+        for slot, total, clock in ((s, 'out_amount_recent', 'out_recent_time'),
+                                   (r, 'in_amount_recent', 'in_recent_time')):
+            aged_to = max(row[slot, _COL[clock]], timestamp)
+            row[slot, _COL[total]] = (row[slot, _COL[total]] * _decay(aged_to - row[slot, _COL[clock]])
+                                      + amount * _decay(aged_to - timestamp))
+            row[slot, _COL[clock]] = aged_to
+        self.clock += 1
+        self.now = max(self.now, timestamp)
+
+    def record_cycles(self, cycles):
+        """Counts a new cycle for every account on each of `cycles`."""
+        for cycle in cycles:
+            for account_id in cycle:
+                slot = self._slot(int(account_id))
+                if slot is not None:
+                    self._values[slot, _COL['cycle_count']] += 1
+
+    def lookup(self, account_id):
+        """Features of one account as a dict; an account with no history gets zeros."""
+        slot = self._slot(int(account_id))
+        if slot is None:
+            return {name: 0 if name in COUNT_FEATURES else 0.0 for name in FEATURES}
+        values = self._values[slot]
+        features = dict(zip(FEATURES, values[:len(FEATURES)].tolist()))
+        # Age the recent sums to the latest transaction time without writing them back
+        features['out_amount_recent'] *= float(_decay(self.now - values[_COL['out_recent_time']]))
+        features['in_amount_recent'] *= float(_decay(self.now - values[_COL['in_recent_time']]))
+        for name in COUNT_FEATURES:
+            features[name] = int(features[name])
+        return features
+
+    def __len__(self):
+        return self._size
+
+
+def load_cycle_counts(path=CYCLE_SEED_PATH):
+    """Per-account cycle counts from the typology sweep table, or None if it has not been run."""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, usecols=['account_id', 'cycle_count'])
+
+
+def main():
+    # Imported here: graph_analysis imports this module
+    from backend import column_store, graph_analysis
+
+    parser = argparse.ArgumentParser(description="Precompute the per-account feature store.")
+    parser.add_argument('--cycles', default=CYCLE_SEED_PATH,
+                        help="Typology sweep table to seed cycle participation from.")
+    args = parser.parse_args()
+
+    graph_analysis.load_graph()
+    cycle_counts = load_cycle_counts(args.cycles)
+    if cycle_counts is None:
+        print(f"No sweep table at {args.cycles}; cycle counts start at zero.")
+    store = AccountFeatureStore.build(
+        graph_analysis.senders.view(), graph_analysis.receivers.view(), graph_analysis.amounts.view(),
+        graph_analysis.timestamps.view(), cycle_counts
+    )
+    if not column_store.exists(column_store.TRANSACTIONS_STORE):
+        print("No column store to save into; run python -m backend.column_store first.")
+        return
+    directory = os.path.join(column_store.TRANSACTIONS_STORE, FEATURES_DIR)
+    store.save(directory)
+    print(f"Saved features for {len(store)} accounts to {directory}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# backend/case_events.py
+"""
+In-process event bus for case changes.
+
+backend.db publishes a "created" or "updated" event with the case summary
+fields after every successful write. Two things are built on it:
+
+- GET /cases/stream, a server-sent-events feed of those deltas, so the
+  case queue can be kept current without re-listing the collection;
+- the ETag of GET /cases, which starts with the current event ID so a
+  stream can resume from the list it was fetched with. The rest of the
+  ETag comes from the database (db.get_cases_version), so writes this bus
+  never sees, from other processes, still change it.
+
+Event IDs are "<boot>-<seq>". The boot token changes on every restart, so
+IDs from a previous process are never taken as current.
+Recent events are kept in a ring buffer. A client reconnecting with a
+Last-Event-ID still in the buffer is sent what it missed; older IDs get
+a "reset" event telling it to reload the list.
+
+The bus and its event IDs are per process. Behind several uvicorn workers
+a stream only carries the writes of the worker serving it, and each worker
+puts its own event ID in the /cases ETag, so conditional GETs that land on
+another worker rarely get a 304. Run a single worker, or pin analysts to
+one, for a complete feed. The bus is used from the event loop only and
+takes no locks.
+"""
+
+import asyncio
+import os
+from collections import deque
+
+EVENT_HISTORY = 1024  # events kept for reconnecting clients
+SUBSCRIBER_QUEUE_SIZE = 256  # events a slow subscriber may fall behind before it is dropped
+EVENT_TYPES = ("created", "updated")
+
+
+class Subscription:
+    """One stream's queue of events; `overflowed` is set if it fell too far behind."""
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+
+class CaseEventBus:
+    """Sequence-numbered case events with a replay buffer and live subscribers."""
+
+    def __init__(self, history=EVENT_HISTORY, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.boot = os.urandom(4).hex()
+        self.seq = 0
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+
+    def event_id(self, seq=None):
+        return f"{self.boot}-{self.seq if seq is None else seq}"
+
+    def publish(self, kind, case):
+        """Records a case change and hands it to every subscriber."""
+        if kind not in EVENT_TYPES:
+            raise ValueError(f"Unknown case event '{kind}'. Expected one of {EVENT_TYPES}.")
+        self.seq += 1
+        event = {"id": self.event_id(), "seq": self.seq, "type": kind, "case": case}
+        self._history.append(event)
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Dropped rather than buffered without bound. Its queue is full, so
+                # the stream wakes up, sees the flag and sends a reset.
+                subscription.overflowed = True
+                self._subscribers.discard(subscription)
+
+    def since(self, event_id):
+        """
+        Events after `event_id`, oldest first.
+
+        Returns None when they can't all be replayed: the ID is from another
+        boot, malformed, or older than the buffer.
+        """
+        boot, _, seq = event_id.partition("-")
+        if boot != self.boot or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        seq = int(seq)
+        if seq == self.seq:
+            return []
+        if not self._history or self._history[0]["seq"] > seq + 1:
+            return None
+        return [event for event in self._history if event["seq"] > seq]
+
+    def subscribe(self):
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def subscribers(self):
+        return len(self._subscribers)
+
+
+case_feed = CaseEventBus()
@@ -0,0 +1,182 @@
+# backend/column_store.py
+"""
+Columnar, memory-mapped transaction store.
+
+Each column is stored as a raw .npy file and opened with mmap_mode='r', so
+every process that reads it (all uvicorn workers, the sweep's pool, training)
+maps the same page-cache pages instead of parsing the CSV and holding its own
+copy. The transaction store also keeps the adjacency index built by
+graph_index, so workers don't each sort the edge columns either.
+
+One-time conversion from the existing files:
+    python -m backend.column_store
+    python -m backend.column_store --source data/generated --name transactions
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from backend.graph_index import AdjacencyIndex
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+STORE_DIR = os.path.join(DATA_DIR, 'store')
+TRANSACTIONS_STORE = os.path.join(STORE_DIR, 'transactions')
+X_TRAIN_STORE = os.path.join(STORE_DIR, 'X_train')
+MANIFEST_FILE = 'columns.json'
+INDEX_DIR = 'index'
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Known column types; anything else keeps the type of its first chunk
+SCHEMA = {
+    'amount': np.float64,
+    'sender_account_age': np.int64,
+    'receiver_account_age': np.int64,
+    'is_fraud': np.int8,
+    'sender_account_id': np.int64,
+    'receiver_account_id': np.int64,
+    'typology': np.int8,
+    'typology_id': np.int64,
+    'timestamp': np.int64,  # Unix seconds
+}
+
+
+def _is_parquet(source):
+    return os.path.isdir(source) or source.endswith('.parquet')
+
+
+def _count_rows(source):
+    """Row count without materializing the data."""
+    if _is_parquet(source):
+        return ds.dataset(source, format='parquet').count_rows()
+    with open(source, 'rb') as f:
+        lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 24), b''))
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            lines += 1  # last line has no trailing newline
+    return lines - 1  # header
+
+
+def iter_chunks(source, chunk_rows, columns=None):
+    """
+    Yields DataFrame chunks from a column store, a Parquet file/directory or
+    a CSV file, holding only one chunk in memory at a time.
+    """
+    if exists(source):
+        mapped = open_columns(source, columns)
+        rows = len(next(iter(mapped.values())))
+        for start in range(0, rows, chunk_rows):
+            yield pd.DataFrame({name: values[start:start + chunk_rows] for name, values in mapped.items()})
+    elif _is_parquet(source):
+        for batch in ds.dataset(source, format='parquet').to_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(source, chunksize=chunk_rows, usecols=columns) as reader:
+            yield from reader
+
+
+def exists(store_dir):
+    """True once a conversion into store_dir has completed."""
+    return os.path.exists(os.path.join(store_dir, MANIFEST_FILE))
+
+
+def convert(source, store_dir, chunk_rows=DEFAULT_CHUNK_ROWS, build_index=None):
+    """
+    Converts a CSV file or Parquet dataset into one .npy file per column,
+    streaming it chunk by chunk. Builds and saves the adjacency index when
+    the data has sender and receiver columns.
+    """
+    rows = _count_rows(source)
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = os.path.join(store_dir, MANIFEST_FILE)
+    if os.path.exists(manifest):
+        os.remove(manifest)  # the store is incomplete until the manifest is rewritten
+
+    print(f"Converting {rows} rows from {source} into {store_dir}...")
+    columns = {}
+    position = 0
+    for chunk in iter_chunks(source, chunk_rows):
+        if not columns:
+            for name in chunk.columns:
+                dtype = SCHEMA.get(name, chunk[name].dtype)
+                if not np.issubdtype(np.dtype(dtype), np.number):
+                    print(f"Skipping non-numeric column '{name}'.")
+                    continue
+                columns[name] = np.lib.format.open_memmap(
+                    os.path.join(store_dir, f"{name}.npy"), mode='w+', dtype=dtype, shape=(rows,)
+                )
+        end = position + len(chunk)
+        for name, column in columns.items():
+            column[position:end] = chunk[name].to_numpy()
+        position = end
+
+    for column in columns.values():
+        column.flush()
+
+    if build_index is None:
+        build_index = {'sender_account_id', 'receiver_account_id'} <= set(columns)
+    if build_index:
+        print("Building adjacency index...")
+        AdjacencyIndex(columns['sender_account_id'], columns['receiver_account_id'], columns.get('timestamp')).save(
+            os.path.join(store_dir, INDEX_DIR)
+        )
+
+    # Written last: its presence marks the store as complete
+    with open(manifest, 'w') as f:
+        json.dump({'rows': rows, 'columns': list(columns), 'source': os.path.abspath(source)}, f)
+    print(f"Converted {len(columns)} columns.")
+    return rows
+
+
+def stored_columns(store_dir):
+    """Names of the columns in a completed store."""
+    with open(os.path.join(store_dir, MANIFEST_FILE)) as f:
+        return json.load(f)['columns']
+
+
+def open_columns(store_dir, columns=None):
+    """Memory-maps the requested columns (default: all) read-only."""
+    names = columns or stored_columns(store_dir)
+    # np.asarray drops the np.memmap subclass (still backed by the mapping),
+    # which makes every slice and fancy index several times cheaper
+    return {name: np.asarray(np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode='r')) for name in names}
+
+
+def open_index(store_dir):
+    """Memory-maps the saved adjacency index, or returns None if there is none."""
+    directory = os.path.join(store_dir, INDEX_DIR)
+    if not os.path.isdir(directory):
+        return None
+    try:
+        return AdjacencyIndex.load(directory)
+    except FileNotFoundError:
+        print(f"The index in {directory} predates per-account timestamps; rerun python -m backend.column_store.")
+        return None
+
+
+def load_frame(store_dir, columns=None):
+    """Reads columns into a DataFrame; this copies, so use it only where a private copy is needed."""
+    return pd.DataFrame({name: np.asarray(values) for name, values in open_columns(store_dir, columns).items()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert transaction data into the memory-mapped column store.")
+    parser.add_argument('--source', help="CSV file or Parquet file/directory to convert. "
+                                         "Default: data/synthetic_data.csv and data/X_train.csv.")
+    parser.add_argument('--name', default='transactions', help="Store name under data/store/.")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    if args.source:
+        convert(args.source, os.path.join(STORE_DIR, args.name), chunk_rows=args.chunk_rows)
+    else:
+        convert(os.path.join(DATA_DIR, 'synthetic_data.csv'), TRANSACTIONS_STORE, chunk_rows=args.chunk_rows)
+        convert(os.path.join(DATA_DIR, 'X_train.csv'), X_TRAIN_STORE, chunk_rows=args.chunk_rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,29 @@
 # backend/db.py
 
 import motor.motor_asyncio
+import base64
+import hashlib
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError
 from pydantic import BaseModel, Field, BeforeValidator
 from typing import Optional, List, Annotated
 import datetime
 
+from backend import metrics
+from backend.case_events import case_feed
+
 MONGO_DETAILS = "mongodb://localhost:27017"
 client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_DETAILS)
 database = client.aml_system
 case_collection = database.get_collection("cases")
 
+# Fields returned by the case list view; the heavy explanation and
+# transaction_details payloads are only fetched for a single case.
+CASE_SUMMARY_FIELDS = ["risk_score", "status", "created_at", "updated_at"]
+MAX_PAGE_SIZE = 500
+
 # --- UPDATED PYDANTIC SCHEMA ---
 class CaseSchema(BaseModel):
     # This is the line we are fixing.
@@ -34,33 +47,141 @@ class CaseSchema(BaseModel):
 
 # --- Database Helper Functions (no changes here) ---
 
-async def create_case(transaction: dict, score: float, explanation: dict) -> dict:
-    """Create a new case in the database."""
-    case_data = {
+def case_summary(case_doc: dict) -> dict:
+    """The list-view fields of a case, as published to the live case feed."""
+    summary = {"_id": str(case_doc["_id"])}
+    summary.update((field, case_doc[field]) for field in CASE_SUMMARY_FIELDS)
+    return summary
+
+def build_case_document(transaction: dict, score: float, explanation: dict) -> dict:
+    """Build the Mongo document for a new case."""
+    now = datetime.datetime.utcnow()
+    return {
         "transaction_details": transaction,
         "risk_score": score,
         "explanation": explanation,
         "status": "Open",
         "notes": "",
-        "created_at": datetime.datetime.utcnow(),
-        "updated_at": datetime.datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
-    new_case = await case_collection.insert_one(case_data)
-    created_case = await case_collection.find_one({"_id": new_case.inserted_id})
-    return CaseSchema(**created_case).dict(by_alias=True)
 
-async def get_all_cases() -> List[dict]:
-    """Retrieve all cases from the database."""
-    cases = []
-    async for case in case_collection.find():
-        cases.append(CaseSchema(**case).dict(by_alias=True))
-    return cases
+async def create_case(transaction: dict, score: float, explanation: dict) -> dict:
+    """Create a new case in the database."""
+    case_data = build_case_document(transaction, score, explanation)
+    # insert_one sets "_id" on the document, so no read-back is needed
+    with metrics.stage("mongo.insert_one"):
+        await case_collection.insert_one(case_data)
+    case_feed.publish("created", case_summary(case_data))
+    return CaseSchema(**case_data).dict(by_alias=True)
+
+async def create_cases_bulk(cases: List[dict]) -> List[dict]:
+    """Create many cases with one unordered insert; returns the cases that were written."""
+    case_docs = [
+        build_case_document(case["transaction_details"], case["risk_score"], case["explanation"])
+        for case in cases
+    ]
+    if not case_docs:
+        return []
+    failed = set()
+    try:
+        with metrics.stage("mongo.insert_many"):
+            await case_collection.insert_many(case_docs, ordered=False)
+    except BulkWriteError as e:
+        # Unordered inserts keep going past failures; drop only the failed documents
+        failed = {error["index"] for error in e.details.get("writeErrors", [])}
+    written = [doc for i, doc in enumerate(case_docs) if i not in failed]
+    for doc in written:
+        case_feed.publish("created", case_summary(doc))
+    return [CaseSchema(**doc).dict(by_alias=True) for doc in written]
+
+async def ensure_indexes():
+    """Create the indexes backing keyset pagination and the list filters."""
+    with metrics.stage("mongo.create_index"):
+        await case_collection.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+        await case_collection.create_index([("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        await case_collection.create_index([("updated_at", DESCENDING), ("_id", DESCENDING)])
+
+async def get_cases_version() -> str:
+    """
+    Short token that changes whenever a case is created or updated, by any
+    process: built from the collection's document count and its most
+    recently updated case. Every writer stamps updated_at with the current
+    time, so this covers writes that bypass this module too (such as
+    stream_scoring's bulk inserts). Mongo keeps updated_at to the
+    millisecond; two updates in the same millisecond may share a token.
+    """
+    with metrics.stage("mongo.cases_version"):
+        count = await case_collection.estimated_document_count()
+        latest = await case_collection.find_one(
+            {}, projection=["updated_at"], sort=[("updated_at", DESCENDING), ("_id", DESCENDING)]
+        )
+    raw = f"{count}|{latest['updated_at'].isoformat()}|{latest['_id']}" if latest else f"{count}"
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+def encode_cursor(case_doc: dict) -> str:
+    """Opaque keyset cursor pointing just past the given case."""
+    raw = f"{case_doc['created_at'].isoformat()}|{case_doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; returns (created_at, ObjectId)."""
+    created_at, case_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.datetime.fromisoformat(created_at), ObjectId(case_id)
+
+async def get_cases_page(limit: int = 50, cursor: Optional[str] = None, status: Optional[str] = None,
+                         min_risk_score: Optional[float] = None, summary: bool = True) -> dict:
+    """
+    Retrieve one page of cases, newest first, using keyset pagination on
+    (created_at, _id). Pass the returned next_cursor to fetch the next page.
+    """
+    query = {}
+    if status is not None:
+        query["status"] = status
+    if min_risk_score is not None:
+        query["risk_score"] = {"$gte": min_risk_score}
+    if cursor:
+        created_at, case_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": case_id}}
+        ]
+
+    projection = CASE_SUMMARY_FIELDS if summary else None
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    with metrics.stage("mongo.find_page"):
+        docs = await case_collection.find(query, projection) \
+            .sort([("created_at", DESCENDING), ("_id", DESCENDING)]) \
+            .limit(limit) \
+            .to_list(length=limit)
+
+    next_cursor = encode_cursor(docs[-1]) if len(docs) == limit else None
+    # Documents are written by this module, so skip per-document schema validation
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return {"cases": docs, "next_cursor": next_cursor}
+
+async def get_case(case_id: str) -> Optional[dict]:
+    """Retrieve a single case with all of its fields."""
+    try:
+        with metrics.stage("mongo.find_one"):
+            case = await case_collection.find_one({"_id": ObjectId(case_id)})
+    except InvalidId:
+        return None
+    return CaseSchema(**case).dict(by_alias=True) if case else None
 
 async def update_case(case_id: str, notes: str, status: str) -> bool:
     """Update a case's notes and status."""
     case_id_obj = ObjectId(case_id)
-    result = await case_collection.update_one(
-        {"_id": case_id_obj},
-        {"$set": {"notes": notes, "status": status, "updated_at": datetime.datetime.utcnow()}}
-    )
-    return result.modified_count == 1
\ No newline at end of file
+    # Returns the updated summary fields in the same round trip, for the case feed
+    with metrics.stage("mongo.find_one_and_update"):
+        updated = await case_collection.find_one_and_update(
+            {"_id": case_id_obj},
+            {"$set": {"notes": notes, "status": status, "updated_at": datetime.datetime.utcnow()}},
+            projection=CASE_SUMMARY_FIELDS,
+            return_document=ReturnDocument.AFTER
+        )
+    if updated is None:
+        return False
+    case_feed.publish("updated", case_summary(updated))
+    return True
\ No newline at end of file
@@ -1,42 +1,682 @@
 # backend/graph_analysis.py
 
 import pandas as pd
-import networkx as nx
+import numpy as np
+import fcntl
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from backend import column_store, metrics
+from backend.account_features import AccountFeatureStore, FEATURES_DIR, load_cycle_counts
+from backend.graph_index import AdjacencyIndex, GrowableColumn
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'synthetic_data.csv')
-df = pd.read_csv(DATA_PATH)
+# Preferred source: the memory-mapped column store (python -m backend.column_store)
+STORE_PATH = column_store.TRANSACTIONS_STORE
+EDGE_COLUMNS = ['sender_account_id', 'receiver_account_id', 'amount']
+TIME_COLUMN = 'timestamp'  # Unix seconds
+
+# --- Edge columns and per-account index, built once by load_graph() ---
+# Loading is deferred to first use (or the API's background warm-up) so
+# importing this module does not read any data. Ingested transactions are
+# appended to the columns and the index, and to the ingest log below.
+# Data without a timestamp column gets timestamp 0 everywhere: windows then
+# include or exclude all of it, and every cycle counts as time-respecting.
+senders = None
+receivers = None
+amounts = None
+timestamps = None
+index = None
+_load_lock = threading.Lock()
+
+# --- Per-account feature store, built once by load_features() ---
+features = None
+_features_lock = threading.Lock()
+
+# --- Search limits for cycle detection ---
+MAX_DEPTH = 4
+DEFAULT_MAX_CYCLE_LENGTH = 6
+DEFAULT_MAX_CYCLES = 100
+DEFAULT_TIME_BUDGET = 2.0  # seconds
+DEADLINE_CHECK_INTERVAL = 256
+MAX_DISTANCE_NODES = 200_000  # accounts the backward hop-distance map may hold
+# Transfers an account may have and still be expanded by searches over the
+# full graph; listing a hub's distinct neighbours alone can exceed a budget
+MAX_EXPANDED_DEGREE = 10_000
+
+# --- Response size limits ---
+DEFAULT_EDGE_LIMIT = 500
+MAX_EDGE_LIMIT = 5000
+RANK_BY = ("amount", "degree")
+RESPONSE_FORMATS = ("records", "columnar")
+
+# --- Live ingestion settings ---
+INGEST_MAX_CYCLE_LENGTH = 4
+INGEST_MAX_CYCLES = 20
+INGEST_TIME_BUDGET = 0.01  # seconds per ingested edge
+MAX_RECENT_ALERTS = 1000
 
-def analyze_account_graph(account_id):
+_ingest_lock = threading.Lock()
+recent_alerts = deque(maxlen=MAX_RECENT_ALERTS)
+
+# --- Ingest log ---
+# Ingested transactions are appended to a binary log next to the loaded data
+# and replayed by load_graph(), so they survive a restart. Each API process
+# appends under an exclusive file lock, after applying what other processes
+# appended, and sync_ingested() applies new records before graph queries, so
+# every uvicorn worker sees every ingest. Rows appended to the columns are
+# therefore the log's records in log order in every process, which the
+# offload workers' shared-buffer sync relies on. The log records the base
+# data's row count; a log left over from other data is set aside as .stale.
+INGEST_LOG = os.environ.get("INGEST_LOG", "1") == "1"
+INGEST_LOG_FILE = 'ingested.log'
+INGEST_LOG_MAGIC = b'AMLINGv1'
+INGEST_LOG_HEADER = 32  # magic, base row count, padding
+INGEST_LOG_DTYPE = np.dtype([('sender', '<i8'), ('receiver', '<i8'), ('amount', '<f8'), ('timestamp', '<i8')])
+
+_log_path = None  # set by load_graph() when the log is in use
+_log_records = 0  # log records applied in this process
+_synced_accounts = set()  # accounts touched by other processes' records, until sync_ingested() reports them
+_known_receivers = {}  # sender -> accounts it has paid, filled on its first ingested transfer
+
+def load_graph():
     """
-    Builds a transaction graph for a specific account and detects cycles.
+    Opens the transaction data and builds the edge columns and index, once per process.
+
+    Uses the column store when it exists, so workers share its memory-mapped
+    columns and saved index; otherwise parses the CSV. Then replays the
+    ingest log.
     """
-    # Filter for transactions involving the target account
-    account_df = df[(df['sender_account_id'] == account_id) | (df['receiver_account_id'] == account_id)]
+    global senders, receivers, amounts, timestamps, index, _log_path, _log_records, _known_receivers
+    if index is not None:
+        return
+    with _load_lock:
+        if index is not None:
+            return
+        _known_receivers = {}
+        saved_index = None
+        if STORE_PATH and column_store.exists(STORE_PATH):
+            names = [name for name in EDGE_COLUMNS + [TIME_COLUMN] if name in column_store.stored_columns(STORE_PATH)]
+            columns = column_store.open_columns(STORE_PATH, names)
+            saved_index = column_store.open_index(STORE_PATH)
+        else:
+            frame = pd.read_csv(DATA_PATH, usecols=lambda name: name in EDGE_COLUMNS + [TIME_COLUMN])
+            columns = {name: frame[name].to_numpy() for name in frame.columns}
+        if TIME_COLUMN not in columns:
+            print("No timestamp column in the transaction data; all transactions are taken as simultaneous.")
+            columns[TIME_COLUMN] = np.zeros(len(columns['sender_account_id']), dtype=np.int64)
+        senders = GrowableColumn(columns['sender_account_id'])
+        receivers = GrowableColumn(columns['receiver_account_id'])
+        amounts = GrowableColumn(columns['amount'])
+        timestamps = GrowableColumn(columns[TIME_COLUMN].astype(np.int64, copy=False))
+        built = saved_index or AdjacencyIndex(senders.view(), receivers.view(), timestamps.view())
 
-    if account_df.empty:
-        return {"nodes": [], "edges": [], "patterns": {"circular_transfers": []}}
+        _log_path = _open_ingest_log(len(senders)) if INGEST_LOG else None
+        _log_records = 0
+        if _log_path is not None:
+            records = _read_ingest_log(0)
+            base = len(senders)
+            for i, (sender, receiver, amount, timestamp) in enumerate(records.tolist()):
+                senders.append(sender)
+                receivers.append(receiver)
+                amounts.append(amount)
+                timestamps.append(timestamp)
+                built.add(base + i, sender, receiver, timestamp)
+            _log_records = len(records)
+            if _log_records:
+                print(f"Replayed {_log_records} ingested transactions from {_log_path}.")
+        # Assigned last: a non-None index means everything above is ready
+        index = built
 
-    # Create a directed graph
-    G = nx.from_pandas_edgelist(
-        account_df,
-        source='sender_account_id',
-        target='receiver_account_id',
-        edge_attr='amount',
-        create_using=nx.DiGraph()
-    )
+def _open_ingest_log(base_rows):
+    """
+    Path of the ingest log for data with `base_rows` rows, created if
+    missing, or None if it can't be used (ingests then live in memory only).
+    """
+    directory = STORE_PATH if STORE_PATH and column_store.exists(STORE_PATH) else os.path.dirname(DATA_PATH)
+    path = os.path.join(directory, INGEST_LOG_FILE)
+    header = INGEST_LOG_MAGIC + np.int64(base_rows).tobytes()
+    header += bytes(INGEST_LOG_HEADER - len(header))
+    try:
+        while True:
+            with open(path, 'a+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                    continue  # another process set this file aside meanwhile
+                f.seek(0)
+                existing = f.read(INGEST_LOG_HEADER)
+                if not existing:
+                    f.write(header)
+                    return path
+                if existing == header:
+                    return path
+                print(f"The ingest log {path} belongs to other data; moving it to {path}.stale.")
+                os.replace(path, path + '.stale')
+    except OSError as e:
+        print(f"Warning: can't use the ingest log {path} ({e}); ingested transactions won't survive a restart.")
+        return None
+
+def _read_ingest_log(start):
+    """Whole log records from record `start` on; a partly written last record is left out."""
+    with open(_log_path, 'rb') as f:
+        f.seek(INGEST_LOG_HEADER + start * INGEST_LOG_DTYPE.itemsize)
+        data = f.read()
+    return np.frombuffer(data[:len(data) - len(data) % INGEST_LOG_DTYPE.itemsize], dtype=INGEST_LOG_DTYPE)
+
+@contextmanager
+def _locked_ingest_log():
+    """The ingest log opened for appending under an exclusive lock, or None when there is no log."""
+    if _log_path is None:
+        yield None
+        return
+    with open(_log_path, 'a+b') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield f
+
+def _is_new_pair(sender, receiver):
+    """
+    True the first time `sender` pays `receiver`, and records that it has.
+    O(1) after the sender's first ingested transfer; callers hold _ingest_lock.
+    """
+    known = _known_receivers.get(sender)
+    if known is None:
+        known = _known_receivers[sender] = set(receivers[index.outgoing(sender)].tolist())
+    if receiver in known:
+        return False
+    known.add(receiver)
+    return True
+
+def _apply_logged(records):
+    """Appends log records written by other processes; callers hold _ingest_lock."""
+    global _log_records
+    for sender, receiver, amount, timestamp in records.tolist():
+        new_pair = _is_new_pair(sender, receiver)
+        append_edge(sender, receiver, amount, timestamp)
+        if features is not None:
+            features.record(sender, receiver, amount, new_pair, timestamp)
+        _synced_accounts.update((sender, receiver))
+    _log_records += len(records)
 
-    # Detect circular transfers (cycles in the graph)
-    cycles = list(nx.simple_cycles(G))
+def _log_has_new_records():
+    return (_log_path is not None
+            and os.path.getsize(_log_path) >= INGEST_LOG_HEADER + (_log_records + 1) * INGEST_LOG_DTYPE.itemsize)
+
+def ingest_pending():
+    """
+    Whether sync_ingested() has anything to do. Takes no lock, so the event
+    loop can call it on every request and leave sync_ingested() to a thread.
+    """
+    return bool(_synced_accounts) or _log_has_new_records()
+
+def sync_ingested():
+    """
+    Applies transactions other API processes ingested since this process
+    last read the log. Returns every account touched by transactions from
+    other processes since the previous call, for cache invalidation.
+    """
+    if not ingest_pending():
+        return set()
+    if _log_has_new_records():
+        with _ingest_lock:
+            _apply_logged(_read_ingest_log(_log_records))
+    with _ingest_lock:
+        accounts = set(_synced_accounts)
+        _synced_accounts.clear()
+    return accounts
+
+def load_features():
+    """
+    Opens the per-account feature store, once per process.
+
+    Uses the store saved by `python -m backend.account_features` when it
+    covers exactly the loaded columns; otherwise builds it from them.
+    """
+    global features
+    if features is not None:
+        return features
+    load_graph()
+    with _features_lock:
+        if features is not None:
+            return features
+        # Ingestion appends under _ingest_lock, so hold it to build from a consistent snapshot
+        with _ingest_lock:
+            directory = os.path.join(STORE_PATH, FEATURES_DIR) if STORE_PATH else None
+            if directory and AccountFeatureStore.saved_clock(directory) == len(senders):
+                store = AccountFeatureStore.load(directory)
+            else:
+                store = AccountFeatureStore.build(
+                    senders.view(), receivers.view(), amounts.view(), timestamps.view(), load_cycle_counts()
+                )
+            features = store
+    return features
+
+def account_successors(account_id, max_degree=None, before_row=None):
+    """
+    Distinct accounts that received money from the account, optionally in
+    rows before `before_row`; None if it sent more than `max_degree` transfers.
+    """
+    load_graph()
+    rows = index.outgoing(account_id)
+    if max_degree is not None and len(rows) > max_degree:
+        return None
+    if before_row is not None:
+        rows = rows[rows < before_row]
+    return np.unique(receivers[rows]).tolist()
+
+def account_predecessors(account_id, max_degree=None, before_row=None):
+    """
+    Distinct accounts that sent money to the account, optionally in rows
+    before `before_row`; None if it received more than `max_degree` transfers.
+    """
+    load_graph()
+    rows = index.incoming(account_id)
+    if max_degree is not None and len(rows) > max_degree:
+        return None
+    if before_row is not None:
+        rows = rows[rows < before_row]
+    return np.unique(senders[rows]).tolist()
+
+def transfer_times(sender, receiver, before_row=None):
+    """Sorted timestamps of every transfer from sender to receiver, optionally only rows before `before_row`."""
+    rows = index.outgoing(sender)
+    if before_row is not None:
+        rows = rows[rows < before_row]
+    return np.sort(timestamps[rows[receivers[rows] == receiver]])
+
+def is_time_respecting(cycle, times_of=transfer_times):
+    """
+    True if the cycle's transfers can happen in chronological order.
+
+    `cycle` lists its accounts, each paying the next and the last paying the
+    first; `times_of(sender, receiver)` gives a pair's sorted transfer times.
+    Money can enter the loop at any account, so every rotation is tried:
+    walking the hops from it, each takes the earliest transfer no earlier
+    than the previous hop's, which finds an ordering whenever one exists.
+    """
+    hops = [times_of(u, v) for u, v in zip(cycle, cycle[1:] + cycle[:1])]
+    for first in range(len(hops)):
+        previous = None
+        for times in hops[first:] + hops[:first]:
+            i = 0 if previous is None else np.searchsorted(times, previous, side='left')
+            if i == len(times):
+                break
+            previous = times[i]
+        else:
+            return True
+    return False
+
+def find_cycles_through(target, successors, predecessors, max_length, max_cycles, deadline, accept=None,
+                        max_nodes=MAX_DISTANCE_NODES):
+    """
+    Enumerates simple cycles that pass through `target`, up to `max_length` edges.
+
+    `successors` and `predecessors` map a node to its distinct neighbours,
+    or to None for a node too large to expand (see MAX_EXPANDED_DEGREE),
+    which the search then skips. Cycles for which `accept(cycle)` is false (e.g. is_time_respecting) are
+    skipped and don't count towards `max_cycles`. The search stops after
+    `max_cycles` cycles or once `deadline` (a time.monotonic() value)
+    passes, and explores at most `max_nodes` accounts around the target.
+    Returns (cycles, truncated).
+    """
+    # Hop distance from each node back to the target, so the depth-first
+    # search only extends paths that can still close within max_length.
+    # Next to a hub this walk alone can cover most of the graph, so it
+    # checks the deadline per node and stops growing at max_nodes accounts.
+    distance = {target: 0}
+    frontier = [target]
+    pruned = False
+    for hops in range(1, max_length):
+        next_frontier = []
+        for node in frontier:
+            if time.monotonic() > deadline:
+                return [], True
+            node_predecessors = predecessors(node)
+            if node_predecessors is None:
+                pruned = True
+                continue
+            for pred in node_predecessors:
+                if pred not in distance:
+                    if len(distance) >= max_nodes:
+                        pruned = True
+                        break
+                    distance[pred] = hops
+                    next_frontier.append(pred)
+                    if len(distance) % DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() > deadline:
+                        return [], True
+            if pruned:
+                break
+        if pruned:
+            # Nodes left out are never entered, so some cycles may be missed
+            break
+        frontier = next_frontier
+
+    cycles = []
+    path = [target]
+    on_path = {target}
+    target_successors = successors(target)
+    if target_successors is None:
+        return [], True
+    stack = [iter(target_successors)]
+    steps = 0
+    while stack:
+        steps += 1
+        if steps % DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() > deadline:
+            return cycles, True
+        nxt = next(stack[-1], None)
+        if nxt is None:
+            stack.pop()
+            on_path.discard(path.pop())
+            continue
+        if nxt == target:
+            if accept is None or accept(path):
+                cycles.append(list(path))
+                if len(cycles) >= max_cycles:
+                    return cycles, True
+        elif nxt not in on_path and nxt in distance and len(path) + distance[nxt] <= max_length:
+            next_successors = successors(nxt)
+            if next_successors is None:
+                pruned = True
+                continue
+            path.append(nxt)
+            on_path.add(nxt)
+            stack.append(iter(next_successors))
+    return cycles, pruned
+
+def _neighborhood_rows(account_id, depth, start=None, end=None):
+    """Row positions of every transaction in [start, end] within `depth` hops of the account."""
+    seen = {account_id}
+    frontier = [account_id]
+    collected = []
+    for _ in range(depth):
+        if not frontier:
+            break
+        hop_rows = np.unique(np.concatenate([index.edge_rows(node, start, end) for node in frontier]))
+        collected.append(hop_rows)
+        next_frontier = []
+        for node in np.concatenate([senders[hop_rows], receivers[hop_rows]]).tolist():
+            if node not in seen:
+                seen.add(node)
+                next_frontier.append(node)
+        frontier = next_frontier
+    if not collected:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(collected))
+
+def aggregate_edges(rows):
+    """
+    Collapses transaction rows into one edge per (sender, receiver) pair.
+
+    Returns a dict of parallel arrays: source, target, count, amount (the
+    total), and the row positions and timestamps of the pair's first and
+    last transfers, ordered by each pair's first transfer.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return {"source": empty, "target": empty, "count": empty, "amount": np.empty(0),
+                "first_row": empty, "last_row": empty, "first_timestamp": empty, "last_timestamp": empty}
+    edge_senders, edge_receivers, edge_amounts = senders[rows], receivers[rows], amounts[rows]
+    edge_times = timestamps[rows]
+    # Sorted by pair, then time; the stable sort keeps same-time rows in their original order
+    order = np.lexsort((edge_times, edge_receivers, edge_senders))
+    s, r = edge_senders[order], edge_receivers[order]
+    starts = np.flatnonzero(np.r_[True, (s[1:] != s[:-1]) | (r[1:] != r[:-1])])
+    counts = np.diff(np.r_[starts, len(order)])
+    sorted_rows = rows[order]
+    edges = {
+        "source": s[starts],
+        "target": r[starts],
+        "count": counts,
+        "amount": np.add.reduceat(edge_amounts[order], starts),
+        "first_row": sorted_rows[starts],
+        "last_row": sorted_rows[starts + counts - 1],
+        "first_timestamp": edge_times[order][starts],
+        "last_timestamp": edge_times[order][starts + counts - 1],
+    }
+    by_first = np.lexsort((edges["first_row"], edges["first_timestamp"]))
+    return {name: values[by_first] for name, values in edges.items()}
+
+def _select_edges(edges, cycles, limit, rank_by, target):
+    """
+    Indices of the edges to return, in first-seen order.
+
+    Every edge on a detected cycle is kept; the rest are ranked by total
+    amount or by the combined degree of their endpoints, up to `limit`
+    edges in all. The target keeps at least its top-ranked edge. Cycle
+    edges (at most max_cycles * max_cycle_length) and that edge can take
+    the result past `limit`.
+    """
+    n = len(edges["source"])
+    if n <= limit:
+        return np.arange(n)
+
+    if rank_by == "degree":
+        nodes, endpoints = np.unique(np.concatenate([edges["source"], edges["target"]]), return_inverse=True)
+        degree = np.bincount(endpoints, minlength=len(nodes))
+        score = (degree[endpoints[:n]] + degree[endpoints[n:]]).astype(np.float64)
+    elif rank_by == "amount":
+        score = edges["amount"].astype(np.float64)
+    else:
+        raise ValueError(f"Unknown rank_by '{rank_by}'. Expected one of {RANK_BY}.")
+
+    cycle_pairs = {(u, v) for cycle in cycles for u, v in zip(cycle, cycle[1:] + cycle[:1])}
+    if cycle_pairs:
+        on_cycle = np.fromiter(
+            ((u, v) in cycle_pairs for u, v in zip(edges["source"].tolist(), edges["target"].tolist())),
+            dtype=bool, count=n
+        )
+        score[on_cycle] = np.inf
+        keep = np.union1d(np.argpartition(-score, limit - 1)[:limit], np.flatnonzero(on_cycle))
+    else:
+        keep = np.sort(np.argpartition(-score, limit - 1)[:limit])
+    # Without this the queried account could drop out of its own graph
+    touches_target = (edges["source"] == target) | (edges["target"] == target)
+    if touches_target.any() and not touches_target[keep].any():
+        candidates = np.flatnonzero(touches_target)
+        keep = np.union1d(keep, candidates[np.argmax(score[candidates])])
+    return keep
+
+def analyze_account_graph(account_id, depth=1, max_cycle_length=DEFAULT_MAX_CYCLE_LENGTH,
+                          max_cycles=DEFAULT_MAX_CYCLES, time_budget=DEFAULT_TIME_BUDGET,
+                          limit=DEFAULT_EDGE_LIMIT, rank_by="amount", response_format="records",
+                          start=None, end=None, time_respecting=True, with_accounts=False):
+    """
+    Builds the `depth`-hop transaction graph around an account and detects
+    bounded cycles through it.
+
+    Only transactions with timestamps in [start, end] (Unix seconds, either
+    bound optional) are read, through binary searches on the time-sorted
+    index. With `time_respecting`, a cycle counts only if its transfers can
+    happen in chronological order.
+
+    Parallel transfers are aggregated into one edge per counterparty pair,
+    and at most `limit` edges are returned, so the response size is bounded
+    whatever the account's degree. `response_format="columnar"` returns
+    nodes and edges as parallel arrays with integer IDs instead of one
+    object each. With `with_accounts`, also returns every account in the
+    neighbourhood (including ones cut by the limit) as an array.
+    """
+    load_graph()
+
+    # Look up only the transactions within reach of the target account
+    with metrics.stage("graph.neighborhood"):
+        rows = _neighborhood_rows(account_id, depth, start, end)
+
+    with metrics.stage("graph.build"):
+        edges = aggregate_edges(rows)
+        successors, predecessors = {}, {}
+        for u, v in zip(edges["source"].tolist(), edges["target"].tolist()):
+            successors.setdefault(u, []).append(v)
+            predecessors.setdefault(v, []).append(u)
+
+    # Transfer times of a pair within the window, from its rows in the neighbourhood
+    pair_times = {}
+
+    def times_of(u, v):
+        if (u, v) not in pair_times:
+            pair_rows = index.outgoing(u, start, end)
+            pair_times[(u, v)] = np.sort(timestamps[pair_rows[receivers[pair_rows] == v]])
+        return pair_times[(u, v)]
+
+    # Detect circular transfers through the target, within the search limits
+    deadline = time.monotonic() + time_budget
+    with metrics.stage("graph.cycles"):
+        cycles, truncated = find_cycles_through(
+            account_id,
+            lambda node: successors.get(node, ()),
+            lambda node: predecessors.get(node, ()),
+            max_length=max_cycle_length,
+            max_cycles=max_cycles,
+            deadline=deadline,
+            accept=(lambda cycle: is_time_respecting(cycle, times_of)) if time_respecting else None
+        )
+    # Unlike the cycle and node limits, running out of time depends on load, so a rerun may find more
+    timed_out = truncated and time.monotonic() > deadline
 
     # Format graph data for visualization
-    nodes = [{"id": str(node)} for node in G.nodes()]
-    edges = [{"source": str(u), "target": str(v), "label": f"${w['amount']}"} for u, v, w in G.edges(data=True)]
+    with metrics.stage("graph.format"):
+        keep = _select_edges(edges, cycles, limit, rank_by, account_id)
+        kept = {name: values[keep] for name, values in edges.items()}
+        kept["amount"] = np.round(kept["amount"], 2)
+        # Nodes in order of first appearance, as the edges introduce them
+        node_ids = list(dict.fromkeys(np.column_stack([kept["source"], kept["target"]]).ravel().tolist()))
+        columns = {name: values.tolist() for name, values in kept.items()}
+        if response_format == "columnar":
+            nodes = {"id": node_ids}
+            edge_data = columns
+        elif response_format == "records":
+            nodes = [{"id": str(node)} for node in node_ids]
+            columns["source"] = [str(node) for node in columns["source"]]
+            columns["target"] = [str(node) for node in columns["target"]]
+            edge_data = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        else:
+            raise ValueError(f"Unknown response format '{response_format}'. Expected one of {RESPONSE_FORMATS}.")
 
-    return {
+    all_nodes = np.unique(np.concatenate([edges["source"], edges["target"]]))
+    result = {
         "nodes": nodes,
-        "edges": edges,
+        "edges": edge_data,
         "patterns": {
             "circular_transfers": cycles
+        },
+        "truncated": truncated,
+        "summary": {
+            "transactions": len(rows),
+            "total_nodes": len(all_nodes),
+            "total_edges": len(edges["source"]),
+            "returned_edges": len(keep),
+            "edges_truncated": len(keep) < len(edges["source"]),
+            "limit_exceeded": len(keep) > limit,
+            "window": {"from": start, "to": end},
+            "time_respecting": time_respecting,
+            "timed_out": timed_out
         }
-    }
\ No newline at end of file
+    }
+    if with_accounts:
+        return result, all_nodes
+    return result
+
+def cycles_closed_by(sender, receiver, timestamp, max_length=INGEST_MAX_CYCLE_LENGTH,
+                     max_cycles=INGEST_MAX_CYCLES, time_budget=INGEST_TIME_BUDGET, row=None):
+    """
+    Finds short time-respecting cycles that use the transfer sender -> receiver made at `timestamp`.
+
+    With `row`, the transfer's position, only earlier transfers can complete
+    a cycle, so the result doesn't depend on what was appended after it.
+    """
+    def successors(node):
+        # Leave the sender only through the new edge
+        return [receiver] if node == sender else account_successors(node, MAX_EXPANDED_DEGREE, row)
+
+    def predecessors(node):
+        return account_predecessors(node, MAX_EXPANDED_DEGREE, row)
+
+    def times_of(u, v):
+        # The cycle must use the new transfer, not an earlier one between the same accounts
+        return np.array([timestamp]) if (u, v) == (sender, receiver) else transfer_times(u, v, row)
+
+    return find_cycles_through(
+        sender, successors, predecessors,
+        max_length=max_length,
+        max_cycles=max_cycles,
+        deadline=time.monotonic() + time_budget,
+        accept=lambda cycle: is_time_respecting(cycle, times_of)
+    )
+
+def append_edge(sender, receiver, amount, timestamp):
+    """Appends one transaction to the edge columns and the index; callers hold _ingest_lock."""
+    row = len(senders)
+    senders.append(sender)
+    receivers.append(receiver)
+    amounts.append(amount)
+    timestamps.append(timestamp)
+    index.add(row, sender, receiver, timestamp)
+    return row
+
+def appended_edges(start=0):
+    """(senders, receivers, amounts, timestamps) of the transactions appended since loading, from `start` on."""
+    with _ingest_lock:
+        return tuple(column.appended()[start:].copy() for column in (senders, receivers, amounts, timestamps))
+
+def ingest_transactions(transactions):
+    """
+    Appends new transactions to the graph and the ingest log, updates the
+    per-account features, and raises an alert for every edge that closes a
+    short time-respecting cycle through its endpoints. Transactions without
+    a timestamp are stamped with the current time.
+
+    Only the appends hold _ingest_lock; the cycle checks run after it is
+    released, each against the transactions before its own row.
+    """
+    global _log_records
+    store = load_features()
+    now = int(time.time())
+    records = np.array([
+        (int(t['sender_account_id']), int(t['receiver_account_id']), float(t['amount']),
+         now if t.get('timestamp') is None else int(t['timestamp']))
+        for t in transactions
+    ], dtype=INGEST_LOG_DTYPE)
+    alerts = []
+    with _ingest_lock, _locked_ingest_log() as log:
+        if log is not None:
+            # Other processes' records first, so every process applies the log in the same order
+            _apply_logged(_read_ingest_log(_log_records))
+            # Written before the rows are applied, so the columns never get ahead of the log;
+            # truncating first drops a record left half-written by a crash
+            with metrics.stage("ingest.log_write"):
+                log.truncate(INGEST_LOG_HEADER + _log_records * INGEST_LOG_DTYPE.itemsize)
+                log.write(records.tobytes())
+                log.flush()
+            _log_records += len(records)
+        appended = []
+        for sender, receiver, amount, timestamp in records.tolist():
+            new_pair = _is_new_pair(sender, receiver)
+            row = append_edge(sender, receiver, amount, timestamp)
+            store.record(sender, receiver, amount, new_pair, timestamp)
+            appended.append((row, sender, receiver, amount, timestamp))
+
+    for row, sender, receiver, amount, timestamp in appended:
+        with metrics.stage("ingest.cycle_check"):
+            cycles, truncated = cycles_closed_by(sender, receiver, timestamp, row=row)
+        if cycles:
+            alert = {
+                "row": row,
+                "sender_account_id": sender,
+                "receiver_account_id": receiver,
+                "amount": amount,
+                "timestamp": timestamp,
+                "circular_transfers": cycles,
+                "truncated": truncated
+            }
+            alerts.append(alert)
+            recent_alerts.append(alert)
+    if alerts:
+        # The store may be growing under another ingest, so its updates take the lock
+        with _ingest_lock:
+            for alert in alerts:
+                store.record_cycles(alert["circular_transfers"])
+        print(f"Ingest: {len(alerts)} new edge(s) closed a circular transfer.")
+    return {"ingested": len(transactions), "total_transactions": len(senders), "alerts": alerts}
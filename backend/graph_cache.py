@@ -0,0 +1,127 @@
+# backend/graph_cache.py
+"""
+Bounded LRU/TTL cache of /graph_analysis responses.
+
+Entries are keyed by account ID and every query parameter, and hold the
+already-serialized JSON body, so a hit skips the subgraph build, the cycle
+search and the response encoding.
+
+Each entry remembers the accounts in its result. Ingesting a transaction
+that touches any of them drops the entry; that is a superset of the
+transactions that could change the result. A result computed while an
+ingest was landing is not stored if that ingest touched its accounts:
+every invalidation bumps an epoch and is kept in a short log, and put()
+checks the log since the epoch the computation started at.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+GRAPH_CACHE_SIZE = int(os.environ.get("GRAPH_CACHE_SIZE", 1024))  # entries
+GRAPH_CACHE_TTL = float(os.environ.get("GRAPH_CACHE_TTL", 300.0))  # seconds
+MAX_CACHED_NODES = 50_000  # larger results are served but not cached
+INVALIDATION_LOG_SIZE = 256
+
+
+class GraphResultCache:
+    """LRU cache with a time-to-live and per-account invalidation."""
+
+    def __init__(self, max_entries=GRAPH_CACHE_SIZE, ttl=GRAPH_CACHE_TTL, max_nodes=MAX_CACHED_NODES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_nodes = max_nodes
+        self._entries = OrderedDict()  # key -> (expires_at, body, accounts)
+        self._by_account = {}  # account -> keys of the entries that contain it
+        self._epoch = 0
+        self._invalidation_log = deque(maxlen=INVALIDATION_LOG_SIZE)  # (epoch, accounts)
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(["hits", "misses", "stores", "evictions", "expirations", "invalidations"], 0)
+
+    def epoch(self):
+        """Pass this to put() for a result computed after this call."""
+        return self._epoch
+
+    def get(self, key):
+        """The cached body for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, body, accounts, epoch):
+        """Stores a body unless it is too large or went stale while it was computed."""
+        accounts = frozenset(accounts)
+        if len(accounts) > self.max_nodes:
+            return False
+        with self._lock:
+            if epoch != self._epoch:
+                if self._epoch - epoch > len(self._invalidation_log):
+                    return False  # the log no longer reaches back that far
+                if any(logged > epoch and not touched.isdisjoint(accounts)
+                       for logged, touched in self._invalidation_log):
+                    return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body, accounts)
+            for account in accounts:
+                self._by_account.setdefault(account, set()).add(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+            return True
+
+    def invalidate(self, accounts):
+        """Drops every entry containing any of the accounts; returns how many were dropped."""
+        accounts = frozenset(accounts)
+        if not accounts:
+            return 0
+        with self._lock:
+            self._epoch += 1
+            self._invalidation_log.append((self._epoch, accounts))
+            keys = set()
+            for account in accounts:
+                keys.update(self._by_account.get(account, ()))
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_account.clear()
+            self._epoch += 1
+            # Nothing computed before a clear may be stored after it
+            self._invalidation_log.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+    def _remove(self, key):
+        _, _, accounts = self._entries.pop(key)
+        for account in accounts:
+            keys = self._by_account.get(account)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_account[account]
+
+
+graph_results = GraphResultCache()
@@ -0,0 +1,164 @@
+# backend/graph_index.py
+
+import os
+
+import numpy as np
+
+EMPTY_ROWS = np.empty(0, dtype=np.int64)
+MIN_CAPACITY = 16
+INDEX_ARRAYS = ['out_keys', 'out_offsets', 'out_rows', 'out_times', 'in_keys', 'in_offsets', 'in_rows', 'in_times']
+
+
+class GrowableColumn:
+    """
+    Append-only numpy column.
+
+    The loaded array, which may be a read-only memory map, is never copied.
+    Appended values go to a separate tail buffer that doubles its capacity
+    when it runs out, so appends cost amortized O(1). Indexing with a row
+    position or an array of row positions reads from whichever part holds
+    each row.
+    """
+
+    def __init__(self, values):
+        self._base = values
+        self._tail = np.empty(0, dtype=values.dtype)
+        self._tail_size = 0
+
+    def append(self, value):
+        if self._tail_size == len(self._tail):
+            grown = np.empty(max(2 * self._tail_size, MIN_CAPACITY), dtype=self._tail.dtype)
+            grown[:self._tail_size] = self._tail[:self._tail_size]
+            self._tail = grown
+        self._tail[self._tail_size] = value
+        self._tail_size += 1
+
+    def appended(self):
+        """Values appended since the column was loaded, in order."""
+        return self._tail[:self._tail_size]
+
+    def view(self):
+        """The whole column as one array; copies only if values were appended."""
+        if self._tail_size == 0:
+            return self._base
+        return np.concatenate([self._base, self._tail[:self._tail_size]])
+
+    def __getitem__(self, rows):
+        if self._tail_size == 0:
+            return self._base[rows]
+        n = len(self._base)
+        rows = np.asarray(rows)
+        if rows.ndim == 0:
+            return self._base[rows] if rows < n else self._tail[rows - n]
+        in_base = rows < n
+        if in_base.all():
+            return self._base[rows]
+        values = np.empty(rows.shape, dtype=self._base.dtype)
+        values[in_base] = self._base[rows[in_base]]
+        values[~in_base] = self._tail[rows[~in_base] - n]
+        return values
+
+    def __len__(self):
+        return len(self._base) + self._tail_size
+
+
+def _build_csr(column, times):
+    """
+    Groups row positions by account in CSR layout, in time order.
+
+    Returns (keys, offsets, rows, row_times): the rows of account keys[i]
+    are rows[offsets[i]:offsets[i + 1]], sorted by timestamp (ties keep
+    their original order), and row_times holds their timestamps.
+    """
+    rows = np.lexsort((times, column))
+    keys, starts = np.unique(column[rows], return_index=True)
+    offsets = np.append(starts, len(column)).astype(np.int64)
+    return keys, offsets, rows.astype(np.int64), np.asarray(times, dtype=np.int64)[rows]
+
+
+class AdjacencyIndex:
+    """
+    Per-account index of outgoing and incoming transaction rows.
+
+    Built once over the sender and receiver columns; a lookup is a binary
+    search over the distinct account IDs plus a slice, so it costs the
+    account's own degree instead of a scan of the whole table. Each
+    account's rows are in time order with their timestamps alongside, so a
+    time window narrows the slice with two more binary searches. Rows
+    appended after the build are kept in per-account lists and returned
+    after the indexed ones, in arrival order.
+    """
+
+    def __init__(self, senders, receivers, timestamps=None):
+        senders = np.asarray(senders)
+        if timestamps is None:
+            timestamps = np.zeros(len(senders), dtype=np.int64)
+        self.out_keys, self.out_offsets, self.out_rows, self.out_times = _build_csr(senders, timestamps)
+        self.in_keys, self.in_offsets, self.in_rows, self.in_times = _build_csr(np.asarray(receivers), timestamps)
+        self.out_added = {}
+        self.in_added = {}
+
+    @classmethod
+    def load(cls, directory):
+        """Opens an index saved by save(), memory-mapping its arrays read-only."""
+        index = cls.__new__(cls)
+        for name in INDEX_ARRAYS:
+            setattr(index, name, np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')))
+        index.out_added = {}
+        index.in_added = {}
+        return index
+
+    def save(self, directory):
+        """Writes the built CSR arrays as .npy files; appended rows are not saved."""
+        os.makedirs(directory, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @staticmethod
+    def _lookup(keys, offsets, rows, times, added, account_id, start, end):
+        i = np.searchsorted(keys, account_id)
+        if i == len(keys) or keys[i] != account_id:
+            indexed = EMPTY_ROWS
+        else:
+            lo, hi = offsets[i], offsets[i + 1]
+            if start is not None or end is not None:
+                account_times = times[lo:hi]
+                if end is not None:
+                    hi = lo + np.searchsorted(account_times, end, side='right')
+                if start is not None:
+                    lo = lo + np.searchsorted(account_times, start, side='left')
+            indexed = rows[lo:hi]
+        extra = added.get(account_id)
+        if extra:
+            extra_rows, extra_times = np.array(extra, dtype=np.int64).T
+            inside = np.ones(len(extra_rows), dtype=bool)
+            if start is not None:
+                inside &= extra_times >= start
+            if end is not None:
+                inside &= extra_times <= end
+            return np.concatenate([indexed, extra_rows[inside]])
+        return indexed
+
+    def add(self, row, sender, receiver, timestamp=0):
+        """Registers an appended transaction row in amortized O(1)."""
+        self.out_added.setdefault(int(sender), []).append((row, timestamp))
+        self.in_added.setdefault(int(receiver), []).append((row, timestamp))
+
+    def outgoing(self, account_id, start=None, end=None):
+        """Row positions of transactions sent by the account, optionally within [start, end]."""
+        return self._lookup(self.out_keys, self.out_offsets, self.out_rows, self.out_times, self.out_added,
+                            account_id, start, end)
+
+    def incoming(self, account_id, start=None, end=None):
+        """Row positions of transactions received by the account, optionally within [start, end]."""
+        return self._lookup(self.in_keys, self.in_offsets, self.in_rows, self.in_times, self.in_added,
+                            account_id, start, end)
+
+    def edge_rows(self, account_id, start=None, end=None):
+        """Sorted row positions of every transaction touching the account, optionally within [start, end]."""
+        return np.union1d(self.outgoing(account_id, start, end), self.incoming(account_id, start, end))
+
+    def accounts(self):
+        """Every account ID that appears as a sender or receiver."""
+        added = np.array(list(self.out_added) + list(self.in_added), dtype=self.out_keys.dtype)
+        return np.unique(np.concatenate([self.out_keys, self.in_keys, added]))
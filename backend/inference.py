@@ -0,0 +1,61 @@
+# backend/inference.py
+"""
+Single-transaction scoring paths.
+
+"fast":   writes the features into a preallocated per-thread numpy row and
+          runs one inplace_predict on the booster, which returns the fraud
+          probability directly (the label is derived from it).
+"pandas": the original path, a one-row DataFrame through predict_proba.
+          Kept as a fallback, selectable with the INFERENCE_PATH variable.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.model_registry import get_model, FEATURE_COLUMNS, FRAUD_THRESHOLD
+
+INFERENCE_PATHS = ("fast", "pandas")
+INFERENCE_PATH = os.environ.get("INFERENCE_PATH", "fast")
+
+# Handlers run on a thread pool, so each thread gets its own input row
+_local = threading.local()
+
+
+def _row_buffer():
+    row = getattr(_local, "row", None)
+    if row is None:
+        row = _local.row = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float32)
+    return row
+
+
+def fraud_probability_fast(amount, sender_account_age, receiver_account_age, model=None):
+    """Fraud probability from one booster call on a reused numpy row."""
+    row = _row_buffer()
+    row[0, 0] = amount
+    row[0, 1] = sender_account_age
+    row[0, 2] = receiver_account_age
+    return float((model or get_model()).get_booster().inplace_predict(row)[0])
+
+
+def fraud_probability_pandas(transaction, model=None):
+    """Fraud probability through a one-row DataFrame and predict_proba."""
+    input_data = pd.DataFrame([transaction])[FEATURE_COLUMNS]
+    return float((model or get_model()).predict_proba(input_data)[0][1])
+
+
+def fraud_probability(transaction, path=None, model=None):
+    """Scores a transaction dict with the configured inference path (default model: the active one)."""
+    path = path or INFERENCE_PATH
+    if path == "fast":
+        return fraud_probability_fast(*(transaction[column] for column in FEATURE_COLUMNS), model=model)
+    if path == "pandas":
+        return fraud_probability_pandas(transaction, model)
+    raise ValueError(f"Unknown inference path '{path}'. Expected one of {INFERENCE_PATHS}.")
+
+
+def is_fraud(probability, threshold=FRAUD_THRESHOLD):
+    """Label rule matching XGBClassifier.predict: probability strictly above the threshold."""
+    return probability > threshold
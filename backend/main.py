@@ -1,31 +1,108 @@
 # backend/main.py
 
-import joblib
 import pandas as pd
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from bson.errors import InvalidId
 from pydantic import BaseModel, Field
-from typing import List
-import os
+from typing import List, Literal, Optional
+import asyncio
+import datetime
+import json
+import threading
+import time
 
 # --- IMPORTS for Database and Case Management ---
-from backend.shap_explainer import get_shap_explanation
-from backend.graph_analysis import analyze_account_graph
-from backend.db import create_case, get_all_cases, update_case, CaseSchema
+from backend import metrics, offload
+from backend.case_events import case_feed
+from backend.graph_cache import graph_results
+from backend.model_registry import get_model, active_version, ModelVersionGone, MODEL_PATH, FEATURE_COLUMNS
+from backend.model_rollout import rollout, model_file, SHADOW_MODEL_PATH, SHADOW_SAMPLE_RATE
+from backend.inference import fraud_probability, is_fraud
+from backend.shap_explainer import get_explainer
+from backend.graph_analysis import (
+    ingest_transactions, load_graph, load_features, recent_alerts, ingest_pending, sync_ingested,
+    MAX_DEPTH, DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES, DEFAULT_TIME_BUDGET,
+    DEFAULT_EDGE_LIMIT, MAX_EDGE_LIMIT
+)
+from backend.db import (
+    create_case, create_cases_bulk, get_cases_page, get_case, get_cases_version, update_case, ensure_indexes,
+    CaseSchema, MAX_PAGE_SIZE
+)
+
+CASE_STREAM_KEEPALIVE = 15.0  # seconds between comments on an idle case stream
 
 app = FastAPI(title="AML Detection API", version="1.0")
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'model.pkl')
-model = None
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.on_event("startup")
 def load_model():
-    """Load the ML model when the server starts up."""
-    global model
+    """Load the ML model when the server starts up, and watch its file for new versions."""
     try:
-        model = joblib.load(MODEL_PATH)
+        get_model()
         print("Model loaded successfully!")
     except FileNotFoundError:
         print(f"Error: Model file not found at {MODEL_PATH}")
-        model = None
+    rollout.watch()
+
+def _warm_up():
+    """Builds the SHAP explainer, the transaction graph, the account features and the worker pool off the startup path."""
+    try:
+        if active_version() is not None:
+            get_explainer()
+        load_graph()
+        load_features()
+        offload.start()
+        print("Explainer, transaction graph, account features and worker pool warmed up.")
+    except Exception as e:
+        # Requests retry the same lazy loaders and report the error themselves
+        print(f"Error during warm-up: {e}")
+    if SHADOW_MODEL_PATH:
+        # Staged after the pool is up, so its workers are warmed with the candidate too
+        rollout.stage(SHADOW_MODEL_PATH, shadow=True)
+
+@app.on_event("startup")
+def start_warm_up():
+    """Warm up heavy state in a background thread so the worker accepts traffic immediately."""
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_worker_pool():
+    rollout.stop()
+    offload.shutdown()
+
+# --- Overload responses for work offloaded to the worker pool ---
+
+@app.exception_handler(offload.Overloaded)
+async def overloaded_handler(request: Request, exc: offload.Overloaded):
+    return JSONResponse(status_code=503, content={"error": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(offload.TimedOut)
+async def timed_out_handler(request: Request, exc: offload.TimedOut):
+    return JSONResponse(status_code=504, content={"error": str(exc)})
+
+@app.exception_handler(offload.Disconnected)
+async def disconnected_handler(request: Request, exc: offload.Disconnected):
+    # Nobody is left to read it; 499 marks the request in the access log and metrics
+    return Response(status_code=499)
+
+@app.exception_handler(ModelVersionGone)
+async def model_version_gone_handler(request: Request, exc: ModelVersionGone):
+    return JSONResponse(status_code=503, content={"error": str(exc)})
+
+async def _create_indexes():
+    try:
+        await ensure_indexes()
+        print("Case indexes are in place.")
+    except Exception as e:
+        print(f"Error: could not create case indexes: {e}")
+
+@app.on_event("startup")
+async def create_case_indexes():
+    """Create the case collection indexes in the background so startup does not wait on Mongo."""
+    asyncio.create_task(_create_indexes())
 
 # --- PYDANTIC MODELS for API requests ---
 
@@ -33,6 +110,35 @@ class Transaction(BaseModel):
     amount: float
     sender_account_age: int
     receiver_account_age: int
+    # Optional: when given, the accounts' behavioral features are joined to the result
+    sender_account_id: Optional[int] = None
+    receiver_account_id: Optional[int] = None
+
+class IngestTransaction(Transaction):
+    sender_account_id: int
+    receiver_account_id: int
+    # ISO 8601 or Unix seconds; defaults to the time of ingestion
+    timestamp: Optional[datetime.datetime] = None
+
+class IngestPayload(BaseModel):
+    transactions: List[IngestTransaction]
+
+ShapEngine = Literal["interventional", "native"]
+GraphRankBy = Literal["amount", "degree"]
+GraphFormat = Literal["records", "columnar"]
+
+def _unix_seconds(value: Optional[datetime.datetime]) -> Optional[int]:
+    """Unix seconds for a datetime; naive datetimes are taken as UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return int(value.timestamp())
+
+class TransactionBatch(BaseModel):
+    transactions: List[Transaction]
+    include_explanations: bool = True
+    shap_engine: Optional[ShapEngine] = None
 
 # --- NEW PYDANTIC MODELS FOR CASE MANAGEMENT ---
 
@@ -41,48 +147,250 @@ class CreateCasePayload(BaseModel):
     risk_score: float
     explanation: dict
 
+class BulkCasePayload(BaseModel):
+    cases: List[CreateCasePayload]
+
 class UpdateCasePayload(BaseModel):
     notes: str
     status: str
 
+# --- PYDANTIC MODELS FOR MODEL ROLLOUT ---
+
+class ModelReloadPayload(BaseModel):
+    # File under models/; defaults to the model.pkl written by ml_model.train_model
+    file: Optional[str] = None
+    # Score a sample of /predict traffic with it instead of activating it
+    shadow: bool = False
+    sample_rate: float = Field(SHADOW_SAMPLE_RATE, ge=0, le=1)
+
 # --- API ENDPOINTS ---
 
 @app.get("/")
 def read_root():
     return {"status": "AML Detection API is running"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Per-stage latency histograms, counters and in-flight gauges in the Prometheus text format."""
+    metrics.set_gauge("aml_offload_pending", offload.pending())
+    cache_stats = graph_results.stats()
+    for name in ("hits", "misses", "stores", "evictions", "expirations", "invalidations"):
+        metrics.set_counter(f"aml_graph_cache_{name}_total", cache_stats[name])
+    metrics.set_gauge("aml_graph_cache_entries", cache_stats["entries"])
+    rollout.export_metrics()
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _account_features(transaction):
+    """Feature-store rows for whichever of the transaction's accounts were given."""
+    store = None
+    features = {}
+    for side in ("sender", "receiver"):
+        account_id = getattr(transaction, f"{side}_account_id")
+        if account_id is not None:
+            store = store or load_features()
+            features[side] = store.lookup(account_id)
+    return features
+
+async def _lookup_account_features(transactions):
+    """_account_features of each transaction, in the threadpool."""
+    # The first lookup may build the feature store; keep that off the event loop
+    return await run_in_threadpool(lambda: [_account_features(t) for t in transactions])
+
 @app.post("/predict")
-def predict_fraud(transaction: Transaction):
-    """Receives transaction data and returns a fraud prediction."""
-    if model is None:
+async def predict_fraud(request: Request, transaction: Transaction, shap_engine: Optional[ShapEngine] = None,
+                        explain: bool = True):
+    """
+    Receives transaction data and returns a fraud prediction.
+
+    Scoring is a sub-millisecond booster call and runs inline; the SHAP
+    explanation runs in the worker pool. Score and explanation come from
+    the same model version, even if a new one is activated meanwhile.
+    """
+    active = active_version()
+    if active is None:
         return {"error": "Model not loaded. Please check server logs."}
 
-    input_data = pd.DataFrame([transaction.dict()])
-    input_data = input_data[['amount', 'sender_account_age', 'receiver_account_age']]
-    
-    prediction = model.predict(input_data)[0]
-    probability = float(model.predict_proba(input_data)[0][1])  # Convert to Python float
-    explanation = get_shap_explanation(input_data)
-    
-    return {
-        "prediction": int(prediction),
+    # One probability call; the label is derived from it
+    with metrics.stage("predict.score"):
+        transaction_data = transaction.dict()
+        start = time.perf_counter()
+        probability = fraud_probability(transaction_data, model=active.model)
+        seconds = time.perf_counter() - start
+        prediction = int(is_fraud(probability))
+    record = {column: transaction_data[column] for column in FEATURE_COLUMNS}
+    # Only queues a sample for the shadow candidate, if there is one
+    rollout.offer(record, probability, seconds)
+
+    result = {
+        "prediction": prediction,
         "is_fraud": bool(prediction),
-        "fraud_probability": float(round(probability, 4)),  # Ensure it's a Python float
-        "explanation": explanation
+        "fraud_probability": round(probability, 4),
+        "model_version": active.number
     }
+    if transaction.sender_account_id is not None or transaction.receiver_account_id is not None:
+        with metrics.stage("predict.account_features"):
+            result["account_features"] = (await _lookup_account_features([transaction]))[0]
+    # Authorization hooks can pass explain=false to stay on the hot path
+    if explain:
+        with metrics.stage("predict.explain"):
+            explanations = await offload.run(offload.explain_task, [record], shap_engine, active,
+                                             timeout=offload.EXPLAIN_TIMEOUT, request=request)
+        result["explanation"] = explanations[0]
+    return result
+
+@app.post("/predict/batch")
+async def predict_fraud_batch(request: Request, batch: TransactionBatch):
+    """
+    Scores a block of transactions as one matrix: one model pass and one
+    SHAP pass, the latter in the worker pool.
+    """
+    active = active_version()
+    if active is None:
+        return {"error": "Model not loaded. Please check server logs."}
+    if not batch.transactions:
+        return {"count": 0, "results": []}
+
+    with metrics.stage("batch.frame"):
+        input_data = pd.DataFrame(
+            [[t.amount, t.sender_account_age, t.receiver_account_age] for t in batch.transactions],
+            columns=FEATURE_COLUMNS
+        )
+
+    # A single predict_proba call gives both the score and the label,
+    # using the same cut-off that XGBClassifier.predict applies.
+    with metrics.stage("batch.score"):
+        probabilities = await run_in_threadpool(lambda: active.model.predict_proba(input_data)[:, 1])
+        predictions = is_fraud(probabilities).astype(int)
+    explanations = None
+    if batch.include_explanations:
+        with metrics.stage("batch.explain"):
+            explanations = await offload.run(offload.explain_task, input_data.to_dict('records'), batch.shap_engine,
+                                             active, timeout=offload.EXPLAIN_TIMEOUT, request=request)
+    account_features = await _lookup_account_features(batch.transactions)
+
+    results = []
+    for i, (prediction, probability) in enumerate(zip(predictions.tolist(), probabilities.tolist())):
+        result = {
+            "prediction": prediction,
+            "is_fraud": bool(prediction),
+            "fraud_probability": round(probability, 4),
+            "model_version": active.number
+        }
+        if account_features[i]:
+            result["account_features"] = account_features[i]
+        if explanations is not None:
+            result["explanation"] = explanations[i]
+        results.append(result)
+
+    return {"count": len(results), "results": results}
 
 @app.get("/graph_analysis/{account_id}")
-def get_graph_analysis(account_id: str):
-    """Performs graph analysis for a given account ID."""
+async def get_graph_analysis(
+    request: Request,
+    account_id: str,
+    depth: int = Query(1, ge=1, le=MAX_DEPTH),
+    max_cycle_length: int = Query(DEFAULT_MAX_CYCLE_LENGTH, ge=1, le=12),
+    max_cycles: int = Query(DEFAULT_MAX_CYCLES, ge=1, le=10000),
+    time_budget: float = Query(DEFAULT_TIME_BUDGET, gt=0, le=30),
+    limit: int = Query(DEFAULT_EDGE_LIMIT, ge=1, le=MAX_EDGE_LIMIT),
+    rank_by: GraphRankBy = "amount",
+    response_format: GraphFormat = Query("records", alias="format"),
+    window_start: Optional[datetime.datetime] = Query(None, alias="from"),
+    window_end: Optional[datetime.datetime] = Query(None, alias="to"),
+    time_respecting: bool = True
+):
+    """
+    Performs graph analysis for a given account ID, expanding `depth` hops.
+
+    Transfers are aggregated per counterparty pair and at most `limit` edges
+    are returned (cycle edges first, then the top edges by `rank_by`),
+    except that every cycle edge and one edge of the account itself are
+    always kept; summary.limit_exceeded says when that took more.
+    `format=columnar` returns parallel arrays instead of one object per
+    node and edge.
+
+    `from` and `to` (ISO 8601 or Unix seconds, inclusive) limit the graph to
+    transactions in that window. With `time_respecting` (the default), a
+    cycle is reported only if its transfers can happen in chronological
+    order.
+
+    Served from the result cache when possible; otherwise computed in the
+    worker pool and cached, unless the cycle search ran out of time.
+    """
     try:
         acc_id_int = int(account_id)
-        graph_data = analyze_account_graph(acc_id_int)
-        return graph_data
     except ValueError:
         return {"error": "Invalid account ID format."}
+    start, end = _unix_seconds(window_start), _unix_seconds(window_end)
+    if start is not None and end is not None and start > end:
+        return {"error": "'from' must not be after 'to'."}
+    key = (acc_id_int, depth, max_cycle_length, max_cycles, time_budget, limit, rank_by, response_format,
+           start, end, time_respecting)
+    # Transactions ingested by other API workers invalidate this worker's results too.
+    # Applying them waits on the ingest lock, so only that goes to a thread.
+    if ingest_pending():
+        graph_results.invalidate(await run_in_threadpool(sync_ingested))
+    body = graph_results.get(key)
+    if body is not None:
+        return Response(body, media_type="application/json")
+
+    epoch = graph_results.epoch()
+    params = {
+        "depth": depth,
+        "max_cycle_length": max_cycle_length,
+        "max_cycles": max_cycles,
+        "time_budget": time_budget,
+        "limit": limit,
+        "rank_by": rank_by,
+        "response_format": response_format,
+        "start": start,
+        "end": end,
+        "time_respecting": time_respecting
+    }
+    try:
+        with metrics.stage("graph_analysis.offload"):
+            graph_data, accounts = await offload.run(
+                offload.graph_task, acc_id_int, params,
+                timeout=time_budget + offload.GRAPH_TIMEOUT_SLACK, graph=True, request=request
+            )
+    except (offload.Overloaded, offload.TimedOut, offload.Disconnected):
+        raise
     except Exception as e:
         return {"error": f"An error occurred: {str(e)}"}
 
+    with metrics.stage("graph_analysis.encode"):
+        body = JSONResponse(graph_data).body
+    # A cycle search cut short by its time budget may find more next time, so it isn't cached.
+    # Every account in the neighbourhood, not just the returned ones, can change the result.
+    if not graph_data["summary"]["timed_out"]:
+        graph_results.put(key, body, {acc_id_int, *accounts.tolist()}, epoch)
+    return Response(body, media_type="application/json")
+
+@app.get("/graph_cache/stats")
+def get_graph_cache_stats():
+    """Hit/miss counters and size of the graph analysis result cache."""
+    return graph_results.stats()
+
+@app.post("/transactions/ingest")
+def ingest_new_transactions(payload: IngestPayload):
+    """Appends transactions to the live graph and reports any new circular transfers."""
+    transactions = [t.dict() for t in payload.transactions]
+    for transaction in transactions:
+        transaction["timestamp"] = _unix_seconds(transaction["timestamp"])
+    result = ingest_transactions(transactions)
+    # Cached graph results containing either endpoint, or an account another
+    # API worker ingested for, may now be out of date
+    graph_results.invalidate(
+        {t["sender_account_id"] for t in transactions} | {t["receiver_account_id"] for t in transactions}
+        | sync_ingested()
+    )
+    return result
+
+@app.get("/transactions/alerts")
+def get_ingest_alerts():
+    """Returns the most recent circular-transfer alerts raised during ingestion."""
+    return {"alerts": list(recent_alerts)}
+
 # --- NEW ENDPOINTS FOR CASE MANAGEMENT ---
 
 @app.post("/cases", response_model=CaseSchema)
@@ -95,11 +403,101 @@ async def add_new_case(payload: CreateCasePayload):
     )
     return new_case
 
-@app.get("/cases", response_model=List[CaseSchema])
-async def get_all_existing_cases():
-    """Retrieves all cases from the database."""
-    cases = await get_all_cases()
-    return cases
+@app.post("/cases/bulk", response_model=List[CaseSchema])
+async def add_new_cases_bulk(payload: BulkCasePayload):
+    """Creates many cases in a single unordered insert."""
+    return await create_cases_bulk([case.dict() for case in payload.cases])
+
+@app.get("/cases")
+async def get_existing_cases(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    min_risk_score: Optional[float] = None,
+    view: Literal["summary", "full"] = "summary"
+):
+    """
+    Retrieves one page of cases, newest first. Follow next_cursor for the next page.
+
+    The ETag changes whenever any case is created or updated, by any API
+    worker or batch job, so a request with a matching If-None-Match is
+    answered with a 304 after a single version lookup instead of the page
+    query.
+    """
+    # Taken before the query: a write racing it can only make the tag older, never hide the write.
+    # The event ID lets the tag seed /cases/stream; the version covers writes it never saw.
+    etag = f'W/"{case_feed.event_id()}.{await get_cases_version()}"'
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    try:
+        return await get_cases_page(
+            limit=limit,
+            cursor=cursor,
+            status=status,
+            min_risk_score=min_risk_score,
+            summary=(view == "summary")
+        )
+    except (ValueError, InvalidId):
+        return {"error": "Invalid cursor."}
+
+def _sse(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+@app.get("/cases/stream")
+async def stream_case_events(request: Request, since: Optional[str] = None):
+    """
+    Server-sent events for case changes: "created" and "updated", with the
+    case's list-view fields as data.
+
+    Resume from an event ID with the Last-Event-ID header, or start from a
+    list fetched with GET /cases by passing its ETag value as `since`.
+    Events that can't be replayed produce a "reset" event: reload the list,
+    then keep reading.
+    """
+    last_event_id = request.headers.get("last-event-id") or since
+
+    async def events():
+        subscription = case_feed.subscribe()
+        try:
+            last_seq = case_feed.seq
+            if last_event_id is not None:
+                backlog = case_feed.since(last_event_id.strip('W/"').partition(".")[0])
+                if backlog is None:
+                    yield _sse(case_feed.event_id(), "reset", {})
+                else:
+                    for event in backlog:
+                        yield _sse(event["id"], event["type"], event["case"])
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), CASE_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if subscription.overflowed:
+                    # Fell too far behind; the client reloads and reconnects
+                    yield _sse(case_feed.event_id(), "reset", {})
+                    return
+                if event["seq"] > last_seq:
+                    yield _sse(event["id"], event["type"], event["case"])
+        finally:
+            case_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cases/{case_id}", response_model=CaseSchema)
+async def get_existing_case(case_id: str):
+    """Retrieves a single case with its transaction details and explanation."""
+    case = await get_case(case_id)
+    if case is None:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return case
 
 @app.put("/cases/{case_id}")
 async def update_existing_case(case_id: str, payload: UpdateCasePayload):
@@ -107,4 +505,42 @@ async def update_existing_case(case_id: str, payload: UpdateCasePayload):
     success = await update_case(case_id, payload.notes, payload.status)
     if success:
         return {"message": "Case updated successfully"}
-    return {"error": "Case not found or not updated"}
\ No newline at end of file
+    return {"error": "Case not found or not updated"}
+
+# --- MODEL ROLLOUT ENDPOINTS ---
+
+@app.get("/admin/model")
+def get_model_status():
+    """The active model version, any shadow candidate with its comparison so far, and recent rollouts."""
+    return rollout.status()
+
+@app.post("/admin/model/reload", status_code=202)
+def reload_model(payload: ModelReloadPayload):
+    """
+    Loads a model file and warms it up in the background, then activates
+    it, or with `shadow` scores a sample of /predict traffic with it.
+    Follow progress on GET /admin/model.
+    """
+    try:
+        path = model_file(payload.file) if payload.file else MODEL_PATH
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if not rollout.stage(path, payload.shadow, payload.sample_rate):
+        return JSONResponse(status_code=409, content={"error": "Another model version is still loading."})
+    return {"message": f"Loading {path}.", "shadow": payload.shadow}
+
+@app.post("/admin/model/promote")
+def promote_shadow_model():
+    """Activates the shadow candidate."""
+    candidate = rollout.promote()
+    if candidate is None:
+        return JSONResponse(status_code=409, content={"error": "No shadow candidate to promote."})
+    return {"message": f"Model version {candidate.number} is now active.", "active": candidate.info()}
+
+@app.post("/admin/model/discard")
+def discard_shadow_model():
+    """Stops shadow scoring and drops the candidate."""
+    candidate = rollout.discard()
+    if candidate is None:
+        return JSONResponse(status_code=409, content={"error": "No shadow candidate to discard."})
+    return {"message": f"Model version {candidate.number} discarded."}
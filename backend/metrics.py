@@ -0,0 +1,228 @@
+# backend/metrics.py
+"""
+Per-stage latency instrumentation, exported in the Prometheus text format.
+
+Hot-path code wraps each stage in `with stage("predict.score"):`. That
+feeds three series per stage:
+- aml_stage_seconds, a latency histogram;
+- aml_stage_errors_total, a count of stages that raised;
+- aml_stage_in_flight, a gauge of stages currently running.
+
+MetricsMiddleware adds the same per HTTP route, labelled by method and
+status. The "<route>.framework" stage is the request time not spent in
+handler stages: pydantic validation, routing and response serialization.
+
+Worker processes (backend.offload) run their stages under collect() and
+send the durations back with the result. The API process then records
+them, so one scrape sees the stages of offloaded work too. Each uvicorn
+worker process has its own registry.
+
+Per-request profile: send `X-Profile: 1` and the response carries a
+Server-Timing header listing every stage of that request in milliseconds.
+"""
+
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds in seconds, from sub-millisecond model calls to slow graph searches
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_HEADER = "x-profile"
+
+_lock = threading.Lock()
+_histograms = {}  # labels -> [bucket counts..., sum, count]
+_counters = defaultdict(float)  # (name, labels) -> value
+_gauges = defaultdict(float)  # (name, labels) -> value
+
+# Stages of the current request, for the Server-Timing header and the framework share
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+# Set inside worker processes: stages are collected for the caller instead of recorded
+_collected = contextvars.ContextVar("collected_stages", default=None)
+# How many stages enclose the current code; only outermost stages count against request time
+_depth = contextvars.ContextVar("stage_depth", default=0)
+
+
+def _observe(name, labels, seconds):
+    key = (name, labels)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                series[i] += 1
+                break
+        series[-2] += seconds
+        series[-1] += 1
+
+
+def _add(metrics, name, labels, value):
+    with _lock:
+        metrics[(name, labels)] += value
+
+
+def record(name, seconds, failed=False, nested=False):
+    """Records one finished stage; `nested` marks stages that ran inside another one."""
+    collected = _collected.get()
+    if collected is not None:
+        collected.append((name, seconds, failed))
+        return
+    labels = (("stage", name),)
+    _observe("aml_stage_seconds", labels, seconds)
+    if failed:
+        _add(_counters, "aml_stage_errors_total", labels, 1)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((name, seconds, nested))
+
+
+class stage:
+    """Context manager timing one stage of work."""
+
+    __slots__ = ("name", "start", "nested", "_token")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        _add(_gauges, "aml_stage_in_flight", (("stage", self.name),), 1)
+        depth = _depth.get()
+        self.nested = depth > 0
+        self._token = _depth.set(depth + 1)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        _depth.reset(self._token)
+        _add(_gauges, "aml_stage_in_flight", (("stage", self.name),), -1)
+        record(self.name, seconds, failed=exc_type is not None, nested=self.nested)
+        return False
+
+
+class collect:
+    """Collects the stages run inside the block into a list of (name, seconds, failed)."""
+
+    def __enter__(self):
+        self.stages = []
+        self._token = _collected.set(self.stages)
+        return self.stages
+
+    def __exit__(self, exc_type, exc, tb):
+        _collected.reset(self._token)
+        return False
+
+
+def replay(stages):
+    """Records stages collected in another process, as nested in the caller's stage."""
+    for name, seconds, failed in stages:
+        record(name, seconds, failed, nested=True)
+
+
+def set_gauge(name, value, labels=()):
+    with _lock:
+        _gauges[(name, labels)] = value
+
+
+def set_counter(name, value, labels=()):
+    """Exports a counter kept elsewhere (e.g. cache statistics) at its current value."""
+    with _lock:
+        _counters[(name, labels)] = value
+
+
+# --- Export ---
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def render():
+    """All series in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    for kind, series_by_key in (("counter", counters), ("gauge", gauges)):
+        for name in sorted({name for name, _ in series_by_key}):
+            lines.append(f"# TYPE {name} {kind}")
+            for (series_name, labels), value in sorted(series_by_key.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series[-2]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP instrumentation ---
+
+def _server_timing(stages, total):
+    entries = [f"{name.replace(' ', '_')};dur={seconds * 1000:.3f}" for name, seconds, _ in stages]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries).encode()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stages = []
+        token = _request_stages.set(stages)
+        profile = any(key == PROFILE_HEADER.encode() and value not in (b"", b"0")
+                      for key, value in scope.get("headers", ()))
+        method = scope["method"]
+        start = time.perf_counter()
+        status = 500
+        _add(_gauges, "aml_http_in_flight", (("method", method),), 1)
+
+        def route():
+            matched = scope.get("route")
+            return getattr(matched, "path", "unmatched")
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = time.perf_counter() - start
+                # Everything not covered by a handler stage: validation, routing, serialization
+                handled = sum(seconds for _, seconds, nested in stages if not nested)
+                record(f"{route()}.framework", max(elapsed - handled, 0.0))
+                if profile:
+                    message = dict(message)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", _server_timing(stages, elapsed))
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stages.reset(token)
+            _add(_gauges, "aml_http_in_flight", (("method", method),), -1)
+            labels = (("route", route()), ("method", method))
+            _observe("aml_http_request_seconds", labels, elapsed)
+            _add(_counters, "aml_http_requests_total", labels + (("status", str(status)),), 1)
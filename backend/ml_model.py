@@ -1,48 +1,230 @@
 # backend/ml_model.py
 import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
 # from sklearn.ensemble import RandomForestClassifier # We are replacing this
+import xgboost as xgb
 from xgboost import XGBClassifier # --- NEW: Import XGBoost ---
-from sklearn.metrics import classification_report
+from sklearn.metrics import classification_report, confusion_matrix
+import argparse
 import joblib
 import os
+import stat
+import tempfile
+import time
+
+from backend import column_store
+from backend.model_registry import FEATURE_COLUMNS, FRAUD_THRESHOLD
+from backend.shap_explainer import summarize_background
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), '..')
+DATA_PATH = os.path.join(BASE_DIR, 'data', 'synthetic_data.csv')
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'model.pkl')
+X_TRAIN_PATH = os.path.join(BASE_DIR, 'data', 'X_train.csv')
+BACKGROUND_PATH = os.path.join(BASE_DIR, 'models', 'background_summary.csv')
+TARGET = 'is_fraud'
+
+# --- Out-of-core training settings ---
+DEFAULT_CHUNK_ROWS = 1_000_000
+TEST_FOLDS = 5                   # every 5th row is held out for evaluation
+BACKGROUND_SAMPLE_ROWS = 100_000  # rows kept for the SHAP background summary
+NUM_BOOST_ROUND = 100            # XGBClassifier's default n_estimators
+
+def _file_mode(path):
+    """Permission bits of an existing file, or those a plain open() would create it with."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def _atomic_write(path, write):
+    """Calls write(tmp_path) and renames the result over `path`, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        # mkstemp creates the file owner-only; keep the replaced file's mode (or the
+        # umask default) so an API running as another user can still read it
+        os.chmod(tmp_path, _file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _save_artifacts(model, background):
+    # Precompute the SHAP background so API workers don't run k-means at startup
+    print(f"Saving SHAP background summary to {BACKGROUND_PATH}...")
+    _atomic_write(BACKGROUND_PATH, lambda tmp: background.to_csv(tmp, index=False))
+    # The model goes last: a running API's model watcher reloads when it changes,
+    # and the new explainer must be built against the new background
+    print(f"Saving model to {MODEL_PATH}...")
+    _atomic_write(MODEL_PATH, lambda tmp: joblib.dump(model, tmp))
 
 def train_model():
     """This function trains the model and saves both the model and its training data."""
-    DATA_PATH = os.path.join('..', 'data', 'synthetic_data.csv')
-    MODEL_PATH = os.path.join('..', 'models', 'model.pkl')
-    X_TRAIN_PATH = os.path.join('..', 'data', 'X_train.csv')
-    
+    features = FEATURE_COLUMNS
+    target = TARGET
+
     print("Loading data...")
-    df = pd.read_csv(DATA_PATH)
+    if column_store.exists(column_store.TRANSACTIONS_STORE):
+        df = column_store.load_frame(column_store.TRANSACTIONS_STORE, features + [target])
+    else:
+        df = pd.read_csv(DATA_PATH)
 
-    features = ['amount', 'sender_account_age', 'receiver_account_age']
-    target = 'is_fraud'
-    
     X = df[features]
     y = df[target]
-    
+
     print("Splitting data...")
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
-    
+
     print(f"Saving X_train data to {X_TRAIN_PATH}...")
     X_train.to_csv(X_TRAIN_PATH, index=False)
-    
+
     # --- NEW: Use XGBClassifier instead of RandomForestClassifier ---
     print("Training the XGBoost model...")
     model = XGBClassifier(use_label_encoder=False, eval_metric='logloss', random_state=42)
     model.fit(X_train, y_train)
-    
+
     print("Evaluating model performance...")
     predictions = model.predict(X_test)
     print(classification_report(y_test, predictions))
-    
-    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-    print(f"Saving model to {MODEL_PATH}...")
-    joblib.dump(model, MODEL_PATH)
+
+    _save_artifacts(model, summarize_background(X_train))
+    print("Model training complete and saved successfully!")
+
+
+class TransactionChunks(xgb.DataIter):
+    """
+    Feeds XGBoost one chunk of training rows at a time.
+
+    Rows whose position is a multiple of TEST_FOLDS are held out for
+    evaluation. On the first pass a bounded sample of training rows is kept
+    for the SHAP background summary.
+    """
+
+    def __init__(self, source, chunk_rows, cache_prefix, seed=42):
+        self._source = source
+        self._chunk_rows = chunk_rows
+        self._chunks = None
+        self._position = 0
+        self._passes = 0
+        self._rng = np.random.default_rng(seed)
+        self.train_rows = 0
+        self.background_sample = []
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = column_store.iter_chunks(self._source, self._chunk_rows, FEATURE_COLUMNS + [TARGET])
+            self._position = 0
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+
+        is_train = np.arange(self._position, self._position + len(chunk)) % TEST_FOLDS != 0
+        self._position += len(chunk)
+        X = chunk.loc[is_train, FEATURE_COLUMNS]
+        if self._passes == 0:
+            self.train_rows += len(X)
+            self._sample_background(X)
+        input_data(data=X.to_numpy(dtype=np.float32), label=chunk.loc[is_train, TARGET].to_numpy(),
+                   feature_names=FEATURE_COLUMNS)
+        return True
+
+    def reset(self):
+        if self._chunks is not None:
+            self._passes += 1
+        self._chunks = None
+
+    def _sample_background(self, X):
+        per_chunk = max(1, BACKGROUND_SAMPLE_ROWS // 10)
+        self.background_sample.append(X.sample(n=min(len(X), per_chunk), random_state=int(self._rng.integers(1 << 31))))
+        kept = sum(len(part) for part in self.background_sample)
+        if kept > BACKGROUND_SAMPLE_ROWS:
+            merged = pd.concat(self.background_sample, ignore_index=True)
+            self.background_sample = [merged.sample(n=BACKGROUND_SAMPLE_ROWS, random_state=42)]
+
+
+def _evaluate_streaming(booster, source, chunk_rows):
+    """Confusion matrix over the held-out rows, one chunk at a time."""
+    counts = np.zeros((2, 2), dtype=np.int64)
+    position = 0
+    for chunk in column_store.iter_chunks(source, chunk_rows, FEATURE_COLUMNS + [TARGET]):
+        is_test = np.arange(position, position + len(chunk)) % TEST_FOLDS == 0
+        position += len(chunk)
+        X = chunk.loc[is_test, FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        if len(X) == 0:
+            continue
+        predictions = (booster.inplace_predict(X) > FRAUD_THRESHOLD).astype(int)
+        counts += confusion_matrix(chunk.loc[is_test, TARGET].to_numpy(), predictions, labels=[0, 1])
+    return counts
+
+def train_model_external(source=None, chunk_rows=DEFAULT_CHUNK_ROWS, num_boost_round=NUM_BOOST_ROUND, nthread=None):
+    """
+    Trains on data larger than memory: chunks stream through an XGBoost
+    DataIter into an external-memory quantile matrix, and trees are grown
+    with the histogram method on every core.
+    """
+    if source is None:
+        source = column_store.TRANSACTIONS_STORE if column_store.exists(column_store.TRANSACTIONS_STORE) else DATA_PATH
+    nthread = nthread or os.cpu_count()
+
+    with tempfile.TemporaryDirectory(prefix='aml_xgb_cache_') as cache_dir:
+        chunks = TransactionChunks(source, chunk_rows, cache_prefix=os.path.join(cache_dir, 'cache'))
+
+        print(f"Building external-memory matrix from {source}...")
+        start = time.perf_counter()
+        dtrain = xgb.ExtMemQuantileDMatrix(chunks, nthread=nthread)
+        load_s = time.perf_counter() - start
+        print(f"Ingested {chunks.train_rows} training rows in {load_s:.1f}s "
+              f"({chunks.train_rows / max(load_s, 1e-9):,.0f} rows/s).")
+
+        print(f"Training the XGBoost model (hist, {nthread} threads)...")
+        params = {
+            'objective': 'binary:logistic',
+            'eval_metric': 'logloss',
+            'tree_method': 'hist',
+            'nthread': nthread,
+            'seed': 42,
+        }
+        start = time.perf_counter()
+        booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+        train_s = time.perf_counter() - start
+        print(f"Trained {num_boost_round} rounds in {train_s:.1f}s "
+              f"({chunks.train_rows * num_boost_round / max(train_s, 1e-9):,.0f} row-rounds/s).")
+
+        # Wrap the booster in the XGBClassifier interface the API expects
+        booster_path = os.path.join(cache_dir, 'booster.json')
+        booster.save_model(booster_path)
+        model = XGBClassifier()
+        model.load_model(booster_path)
+
+    print("Evaluating model performance on held-out rows...")
+    (tn, fp), (fn, tp) = _evaluate_streaming(booster, source, chunk_rows)
+    precision = tp / max(tp + fp, 1)
+    recall = tp / max(tp + fn, 1)
+    print(f"Fraud class: precision {precision:.3f}, recall {recall:.3f} "
+          f"(tp={tp}, fp={fp}, fn={fn}, tn={tn})")
+
+    background_rows = pd.concat(chunks.background_sample, ignore_index=True)
+    _save_artifacts(model, summarize_background(background_rows))
     print("Model training complete and saved successfully!")
 
 if __name__ == '__main__':
-    train_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the fraud model.")
+    parser.add_argument('--external', action='store_true',
+                        help="Stream the data in chunks instead of loading it into memory.")
+    parser.add_argument('--source', help="Column store, Parquet dataset or CSV to train on (with --external).")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--rounds', type=int, default=NUM_BOOST_ROUND)
+    args = parser.parse_args()
+
+    if args.external:
+        train_model_external(args.source, chunk_rows=args.chunk_rows, num_boost_round=args.rounds)
+    else:
+        train_model()
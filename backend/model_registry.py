@@ -0,0 +1,161 @@
+# backend/model_registry.py
+"""
+Single shared home for the trained model.
+
+Every module that needs the model goes through get_model(), so the pickle is
+read once per process no matter how many parts of the API use it.
+
+The model lives in a versioned slot. Each ModelVersion holds one loaded
+model and, once built, its SHAP explainer; activate() swaps the active
+version with a single reference assignment, so a request that took the
+active version keeps scoring and explaining with it while new requests get
+the new one. backend.model_rollout loads, warms and activates new versions.
+
+A ModelVersion pickles to a stub naming its file (path, mtime and size), so
+tasks sent to worker processes carry the version instead of the model;
+resolve() loads the stub's file in the worker the first time it is seen.
+"""
+
+import os
+import threading
+import time
+
+import joblib
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'model.pkl')
+BACKGROUND_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'background_summary.csv')
+
+FEATURE_COLUMNS = ['amount', 'sender_account_age', 'receiver_account_age']
+FRAUD_THRESHOLD = 0.5  # XGBClassifier.predict cut-off on the fraud probability
+
+MAX_RESOLVED_VERSIONS = 3  # loaded versions a process keeps for resolve()
+# Booster threads for models loaded in this process; None keeps the pickled setting
+MODEL_THREADS = None
+
+
+class ModelVersionGone(Exception):
+    """Raised when a version's file has been replaced before this process could load it."""
+
+
+class ModelVersion:
+    """One loaded model file, numbered in load order, with its explainer once built."""
+
+    def __init__(self, number, path, model, mtime_ns, size):
+        self.number = number
+        self.path = path
+        self.model = model
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.loaded_at = time.time()
+        self.explainer = None  # built by shap_explainer.get_explainer
+        self.lock = threading.Lock()
+
+    @property
+    def key(self):
+        """Identifies the file contents the model was loaded from."""
+        return os.path.realpath(self.path), self.mtime_ns, self.size
+
+    def info(self):
+        return {
+            "version": self.number,
+            "path": os.path.realpath(self.path),
+            "modified_at": self.mtime_ns / 1e9,
+            "loaded_at": self.loaded_at,
+            "explainer_ready": self.explainer is not None
+        }
+
+    def __getstate__(self):
+        # Worker processes load the file themselves; see resolve()
+        return {"number": self.number, "path": self.path, "mtime_ns": self.mtime_ns,
+                "size": self.size, "loaded_at": self.loaded_at}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.model = None
+        self.explainer = None
+        self.lock = threading.Lock()
+
+
+_active = None
+_versions_loaded = 0
+_resolved = {}  # key -> ModelVersion, for resolve()
+_lock = threading.Lock()
+
+
+def _keep(version):
+    """Remembers a loaded version for resolve(), keeping the newest few. Call with _lock held."""
+    _resolved.pop(version.key, None)
+    _resolved[version.key] = version
+    while len(_resolved) > MAX_RESOLVED_VERSIONS:
+        del _resolved[next(iter(_resolved))]
+
+
+def load_version(path=MODEL_PATH):
+    """Loads a model file as a new, not yet active, ModelVersion."""
+    global _versions_loaded
+    stat = os.stat(path)
+    model = joblib.load(path)
+    if MODEL_THREADS is not None:
+        model.set_params(n_jobs=MODEL_THREADS)
+    with _lock:
+        _versions_loaded += 1
+        return ModelVersion(_versions_loaded, path, model, stat.st_mtime_ns, stat.st_size)
+
+
+def get_active():
+    """Returns the active ModelVersion, loading MODEL_PATH on first use."""
+    global _active
+    if _active is None:
+        version = load_version(MODEL_PATH)
+        with _lock:
+            if _active is None:
+                _active = version
+                _keep(version)
+    return _active
+
+
+def active_version():
+    """The active ModelVersion, or None if no model has been loaded yet."""
+    return _active
+
+
+def activate(version):
+    """Makes `version` the active one and returns the version it replaced."""
+    global _active
+    with _lock:
+        previous, _active = _active, version
+        _keep(version)
+    return previous
+
+
+def resolve(version):
+    """
+    The loaded ModelVersion for `version`, which may be a stub unpickled in
+    another process. Loads its file on first sight and keeps the last few.
+
+    Raises ModelVersionGone if the file no longer holds that version: the
+    result would come from a different model than the one that scored the
+    request.
+    """
+    if version.model is not None:
+        return version
+    with _lock:
+        loaded = _resolved.get(version.key)
+    if loaded is not None:
+        return loaded
+    loaded = load_version(version.path)
+    loaded.number = version.number
+    if loaded.key != version.key:
+        # Checked after loading: the file may also be replaced while it is being read
+        raise ModelVersionGone(
+            f"{version.path} was replaced after model version {version.number} was loaded. "
+            "Reload the model and retry."
+        )
+    with _lock:
+        _keep(loaded)
+    return loaded
+
+
+def get_model():
+    """Returns the active model, loading it on first use."""
+    return get_active().model
@@ -0,0 +1,335 @@
+# backend/model_rollout.py
+"""
+Zero-downtime model rollout.
+
+A new model file is loaded as a ModelVersion in a background thread and
+warmed up before any request sees it: one booster prediction, its SHAP
+explainer and an explanation from each engine, and the same in every
+offload worker. Only then is it either
+
+- promoted: model_registry.activate() swaps the active version in one
+  reference assignment. Requests already running finish on the version
+  they started with, so nothing is dropped; or
+- put in shadow mode as the candidate. /predict hands a sample of its
+  requests (SHADOW_SAMPLE_RATE) to a bounded queue and returns; a
+  background thread scores them with the candidate and compares its
+  probability, label and latency with the active model's. The request
+  path only pays a random draw and a non-blocking put, and samples are
+  dropped (and counted) when the queue is full. The candidate is then
+  promoted or discarded through the admin endpoints.
+
+Rollouts are triggered through POST /admin/model/reload or by the file
+watcher, which polls MODEL_PATH every MODEL_WATCH_INTERVAL seconds (off by
+default) and stages the file when ml_model.train_model replaces it.
+SHADOW_MODEL_PATH stages a candidate in shadow mode at startup.
+
+The slot lives in one API process, like the metrics registry: with several
+uvicorn workers, use the watcher so that every process picks up the file.
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from backend import metrics, offload
+from backend.inference import fraud_probability, is_fraud
+from backend.model_registry import (
+    activate, active_version, load_version, MODEL_PATH, FEATURE_COLUMNS
+)
+from backend.shap_explainer import get_explainer
+
+MODELS_DIR = os.path.dirname(MODEL_PATH)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 0))  # seconds; 0 disables the watcher
+MODEL_WATCH_SHADOW = os.environ.get("MODEL_WATCH_SHADOW", "0") == "1"  # stage watched files as shadow candidates
+SHADOW_MODEL_PATH = os.environ.get("SHADOW_MODEL_PATH")
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", 0.1))
+SHADOW_QUEUE_SIZE = int(os.environ.get("SHADOW_QUEUE_SIZE", 1000))
+SHADOW_LATENCY_WINDOW = 1000  # recent samples kept for the latency percentiles
+ROLLOUT_HISTORY = 20
+
+
+def model_file(name):
+    """Path of a model file under models/; refuses anything outside it."""
+    path = os.path.realpath(os.path.join(MODELS_DIR, name))
+    if os.path.commonpath([path, os.path.realpath(MODELS_DIR)]) != os.path.realpath(MODELS_DIR):
+        raise ValueError(f"Model files must be inside {os.path.realpath(MODELS_DIR)}.")
+    if not os.path.isfile(path):
+        raise ValueError(f"No model file at {path}.")
+    return path
+
+
+def warm_up(version):
+    """Checks a loaded version and builds everything its first request would otherwise wait for."""
+    model = version.model
+    n_features = getattr(model, "n_features_in_", len(FEATURE_COLUMNS))
+    if n_features != len(FEATURE_COLUMNS):
+        raise ValueError(f"Model expects {n_features} features, the API sends {len(FEATURE_COLUMNS)}.")
+    frame = pd.DataFrame([[1000.0, 365, 365]], columns=FEATURE_COLUMNS)
+    probability = fraud_probability(frame.iloc[0].to_dict(), model=model)
+    if not 0.0 <= probability <= 1.0:
+        raise ValueError(f"Model returned {probability} as a fraud probability.")
+    model.predict_proba(frame)
+    # Called directly rather than through compute_shap_matrix, so the
+    # warm-up doesn't show up in the request latency histograms
+    get_explainer(version).shap_values(frame)
+    model.get_booster().predict(xgb.DMatrix(frame), pred_contribs=True)
+    offload.warm(version)
+
+
+class ShadowScorer:
+    """Scores sampled requests with a candidate version off the request path and compares."""
+
+    def __init__(self, candidate, sample_rate=SHADOW_SAMPLE_RATE, queue_size=SHADOW_QUEUE_SIZE):
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.started_at = time.time()
+        self._queue = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(["sampled", "dropped", "compared", "agreements", "failures"], 0)
+        self._abs_delta_sum = 0.0
+        self._max_abs_delta = 0.0
+        self._primary_seconds_sum = 0.0
+        self._candidate_seconds_sum = 0.0
+        self._recent = deque(maxlen=SHADOW_LATENCY_WINDOW)  # (primary_seconds, candidate_seconds)
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def offer(self, record, probability, seconds):
+        """Queues a scored request for comparison if it is sampled; never blocks."""
+        if random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((record, probability, seconds))
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            return
+        with self._lock:
+            self._stats["sampled"] += 1
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        model = self.candidate.model
+        while not self._stop.is_set():
+            try:
+                record, primary, primary_seconds = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                probability = fraud_probability(record, model=model)
+            except Exception as e:
+                with self._lock:
+                    self._stats["failures"] += 1
+                print(f"Shadow scoring failed: {e}")
+                continue
+            seconds = time.perf_counter() - start
+            metrics.record("shadow.score", seconds)
+            delta = abs(probability - primary)
+            with self._lock:
+                self._stats["compared"] += 1
+                self._stats["agreements"] += int(is_fraud(probability) == is_fraud(primary))
+                self._abs_delta_sum += delta
+                self._max_abs_delta = max(self._max_abs_delta, delta)
+                self._primary_seconds_sum += primary_seconds
+                self._candidate_seconds_sum += seconds
+                self._recent.append((primary_seconds, seconds))
+
+    def report(self):
+        """Agreement and latency comparison so far; latencies in milliseconds."""
+        with self._lock:
+            stats = dict(self._stats)
+            compared = stats["compared"]
+            recent = np.array(self._recent, dtype=np.float64).reshape(-1, 2)
+            report = {
+                "candidate": self.candidate.info(),
+                "sample_rate": self.sample_rate,
+                "started_at": self.started_at,
+                "queued": self._queue.qsize(),
+                **stats,
+                "agreement_rate": stats["agreements"] / compared if compared else None,
+                "mean_abs_probability_delta": self._abs_delta_sum / compared if compared else None,
+                "max_abs_probability_delta": self._max_abs_delta,
+                "primary_latency_ms": {"mean": 1000 * self._primary_seconds_sum / compared if compared else None},
+                "candidate_latency_ms": {"mean": 1000 * self._candidate_seconds_sum / compared if compared else None},
+            }
+        for side, column in (("primary_latency_ms", 0), ("candidate_latency_ms", 1)):
+            for q in (50, 95):
+                report[side][f"p{q}"] = float(1000 * np.percentile(recent[:, column], q)) if len(recent) else None
+        if compared:
+            report["latency_delta_ms"] = report["candidate_latency_ms"]["mean"] - report["primary_latency_ms"]["mean"]
+        else:
+            report["latency_delta_ms"] = None
+        return report
+
+
+class ModelRollout:
+    """Stages, shadows, promotes and discards model versions for the active slot."""
+
+    def __init__(self):
+        self.state = "idle"  # idle | loading
+        self.error = None
+        self.candidate = None
+        self.shadow = None
+        self.history = deque(maxlen=ROLLOUT_HISTORY)
+        self._lock = threading.Lock()
+        self._watcher_stop = threading.Event()
+        self._watcher = None
+
+    def _log(self, action, version, **details):
+        self.history.append({"action": action, "version": version.number, "path": version.path,
+                             "at": time.time(), **details})
+
+    def stage(self, path=MODEL_PATH, shadow=False, sample_rate=SHADOW_SAMPLE_RATE):
+        """
+        Loads and warms up a model file in a background thread, then promotes
+        it or makes it the shadow candidate. False if another one is loading.
+        """
+        with self._lock:
+            if self.state == "loading":
+                return False
+            self.state = "loading"
+            self.error = None
+        threading.Thread(target=self._stage, args=(path, shadow, sample_rate),
+                         name="model-stage", daemon=True).start()
+        return True
+
+    def _stage(self, path, shadow, sample_rate):
+        try:
+            with metrics.stage("rollout.load"):
+                version = load_version(path)
+            with metrics.stage("rollout.warm_up"):
+                warm_up(version)
+        except Exception as e:
+            print(f"Error: could not stage model {path}: {e}")
+            with self._lock:
+                self.state = "idle"
+                self.error = f"{path}: {e}"
+            return
+        if shadow:
+            self._set_candidate(version, sample_rate)
+            print(f"Model version {version.number} from {path} is in shadow mode.")
+        else:
+            self._activate(version)
+        with self._lock:
+            self.state = "idle"
+
+    def _set_candidate(self, version, sample_rate):
+        with self._lock:
+            previous = self.shadow
+            self.candidate = version
+            self.shadow = ShadowScorer(version, sample_rate)
+            self._log("shadow", version, sample_rate=sample_rate)
+        if previous is not None:
+            previous.stop()
+
+    def _activate(self, version):
+        previous = activate(version)
+        self._log("promote", version, replaced=previous.number if previous is not None else None)
+        print(f"Model version {version.number} from {version.path} is now active.")
+
+    def promote(self):
+        """Makes the shadow candidate the active version; returns it, or None if there is none."""
+        with self._lock:
+            candidate, shadow = self.candidate, self.shadow
+            self.candidate = self.shadow = None
+        if candidate is None:
+            return None
+        shadow.stop()
+        self._activate(candidate)
+        return candidate
+
+    def discard(self):
+        """Drops the shadow candidate; returns it, or None if there is none."""
+        with self._lock:
+            candidate, shadow = self.candidate, self.shadow
+            self.candidate = self.shadow = None
+            if candidate is not None:
+                self._log("discard", candidate)
+        if shadow is not None:
+            shadow.stop()
+        return candidate
+
+    def offer(self, record, probability, seconds):
+        """Hands a request scored by the active version to the shadow scorer, if one is running."""
+        shadow = self.shadow
+        if shadow is not None:
+            shadow.offer(record, probability, seconds)
+
+    def status(self):
+        active = active_version()
+        shadow = self.shadow
+        return {
+            "active": active.info() if active is not None else None,
+            "state": self.state,
+            "last_error": self.error,
+            "shadow": shadow.report() if shadow is not None else None,
+            "watcher": {"path": os.path.realpath(MODEL_PATH), "interval": MODEL_WATCH_INTERVAL,
+                        "shadow": MODEL_WATCH_SHADOW} if self._watcher is not None else None,
+            "history": list(self.history)
+        }
+
+    def export_metrics(self):
+        """Publishes the active version and shadow comparison on /metrics."""
+        active = active_version()
+        if active is not None:
+            metrics.set_gauge("aml_model_version", active.number)
+        shadow = self.shadow
+        if shadow is None:
+            return
+        report = shadow.report()
+        labels = (("candidate", str(report["candidate"]["version"])),)
+        for name in ("sampled", "dropped", "compared", "agreements", "failures"):
+            metrics.set_counter(f"aml_shadow_{name}_total", report[name], labels)
+        for name, value in (("agreement_rate", report["agreement_rate"]),
+                            ("mean_abs_probability_delta", report["mean_abs_probability_delta"]),
+                            ("latency_delta_ms", report["latency_delta_ms"])):
+            if value is not None:
+                metrics.set_gauge(f"aml_shadow_{name}", value, labels)
+
+    # --- File watcher ---
+
+    def watch(self, path=MODEL_PATH, interval=MODEL_WATCH_INTERVAL, shadow=MODEL_WATCH_SHADOW):
+        """Polls the model file and stages it whenever it is replaced."""
+        if self._watcher is not None or interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(path, interval, shadow),
+                                         name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, path, interval, shadow):
+        active = active_version()
+        seen = active.key[1:] if active is not None and active.key[0] == os.path.realpath(path) else _file_key(path)
+        while not self._watcher_stop.wait(interval):
+            current = _file_key(path)
+            # ml_model replaces the file atomically, so a changed stat means a complete new model
+            if current is None or current == seen:
+                continue
+            if self.stage(path, shadow):
+                seen = current
+            # otherwise another version is loading; try again on the next tick
+
+    def stop(self):
+        self._watcher_stop.set()
+        self.discard()
+
+
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+rollout = ModelRollout()
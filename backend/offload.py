@@ -0,0 +1,348 @@
+# backend/offload.py
+"""
+Process-pool offload for CPU-bound request work.
+
+SHAP explanations and cycle searches hold the GIL, so running them in the
+API's thread pool stalls every other request in the worker, including the
+async Mongo-backed endpoints. Handlers submit that work here instead:
+
+- a bounded pool of OFFLOAD_WORKERS processes. They are spawned, not
+  forked, because the API process runs threads and OpenMP, which don't
+  survive a fork;
+- at most OFFLOAD_MAX_PENDING tasks queued or running. Beyond that, run()
+  fails fast with Overloaded, which the API turns into a 503;
+- a timeout per call (TimedOut, a 504);
+- cancellation of abandoned work. A call that times out, or whose client
+  disconnects (when run() is given the request), cancels its task if it
+  is still queued. Every task also carries a wall-clock deadline that
+  workers check before starting, so work already handed to a worker is
+  skipped as well.
+
+Explain tasks name the model version they were scored with. Workers keep
+the versions they have loaded and load a new one on first sight, and
+warm() has every worker load a version before it is activated, so a model
+swap never makes a request wait for it.
+
+Workers load their own copy of the graph, memory-mapped from the column
+store when it exists, and are handed the transactions the API ingested
+before the pool started. Later ones are published to a shared-memory
+buffer, and each graph task tells the worker how many of them to replay
+before it runs. When the buffer fills up the pool is replaced by a fresh
+one, which starts with an empty buffer.
+
+OFFLOAD_MODE=inline runs the same tasks on a thread pool instead, for
+development or single-core machines.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from backend import graph_analysis, metrics, model_registry
+from backend.model_registry import FEATURE_COLUMNS
+from backend.shap_explainer import get_explainer, get_shap_explanations
+
+OFFLOAD_MODES = ("process", "inline")
+OFFLOAD_MODE = os.environ.get("OFFLOAD_MODE", "process")
+OFFLOAD_WORKERS = int(os.environ.get("OFFLOAD_WORKERS", 0)) or os.cpu_count() or 1
+OFFLOAD_MAX_PENDING = int(os.environ.get("OFFLOAD_MAX_PENDING", 0)) or 4 * OFFLOAD_WORKERS
+EXPLAIN_TIMEOUT = float(os.environ.get("OFFLOAD_EXPLAIN_TIMEOUT", 10.0))  # seconds
+GRAPH_TIMEOUT_SLACK = 5.0  # seconds on top of the request's cycle-search budget
+INGEST_BUFFER_ROWS = 1_000_000  # ingested transactions shared with workers before the pool is replaced
+DISCONNECT_POLL_INTERVAL = 0.25  # seconds between client disconnect checks
+
+
+class Overloaded(Exception):
+    """Raised when the pending-task limit is reached or the pool is unavailable."""
+
+
+class TimedOut(Exception):
+    """Raised when a task does not finish within its timeout."""
+
+
+class Disconnected(Exception):
+    """Raised when the client gave up before its task finished."""
+
+
+# --- Parent side ---
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+_pending_lock = threading.Lock()
+_shared = None  # (senders, receivers, amounts, timestamps) shared-memory arrays
+_shared_start = 0  # ingested transactions before the buffer's first row
+_published = 0
+_publish_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _shared, _shared_start, _published
+    if _executor is not None:
+        return _executor
+    with _executor_lock:
+        if _executor is None:
+            if OFFLOAD_MODE == "inline":
+                _executor = ThreadPoolExecutor(OFFLOAD_WORKERS, thread_name_prefix="offload")
+            elif OFFLOAD_MODE == "process":
+                context = multiprocessing.get_context("spawn")
+                with _publish_lock:
+                    # Each pool gets a fresh buffer and the rows ingested so far
+                    ingested = graph_analysis.appended_edges() if graph_analysis.index is not None else None
+                    _shared = (
+                        context.RawArray('q', INGEST_BUFFER_ROWS),
+                        context.RawArray('q', INGEST_BUFFER_ROWS),
+                        context.RawArray('d', INGEST_BUFFER_ROWS),
+                        context.RawArray('q', INGEST_BUFFER_ROWS),
+                    )
+                    _shared_start = _published = len(ingested[0]) if ingested else 0
+                _executor = ProcessPoolExecutor(
+                    OFFLOAD_WORKERS, mp_context=context, initializer=_init_worker,
+                    initargs=(graph_analysis.DATA_PATH, graph_analysis.STORE_PATH, _shared, _shared_start, ingested)
+                )
+            else:
+                raise ValueError(f"Unknown offload mode '{OFFLOAD_MODE}'. Expected one of {OFFLOAD_MODES}.")
+    return _executor
+
+
+def _discard_executor(executor, cancel_futures=True):
+    """Drops a pool so the next call starts a fresh one; a broken pool's queued tasks are cancelled."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=cancel_futures)
+
+
+def _publish():
+    """
+    Copies newly ingested transactions into the shared buffer.
+
+    Returns how many ingested transactions workers can replay, or None once
+    the buffer is full and the pool must be replaced.
+    """
+    global _published
+    if graph_analysis.index is None:
+        return 0
+    with _publish_lock:
+        new_edges = graph_analysis.appended_edges(_published)
+        end = _published + len(new_edges[0])
+        if end - _shared_start > INGEST_BUFFER_ROWS:
+            return None
+        for buffer, values, dtype in zip(_shared, new_edges, _SHARED_DTYPES):
+            np.frombuffer(buffer, dtype=dtype)[_published - _shared_start:end - _shared_start] = values
+        _published = end
+        return _published
+
+
+_SHARED_DTYPES = (np.int64, np.int64, np.float64, np.int64)
+
+
+def _task_done(_future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _submit(task, submitted, deadline, graph, args):
+    """Publishes ingested rows for graph tasks and submits the task; returns (executor, future)."""
+    executor = None
+    try:
+        executor = _get_executor()
+        published = None
+        if graph and OFFLOAD_MODE == "process":
+            published = _publish()
+            if published is None:
+                print(f"Offload: more than {INGEST_BUFFER_ROWS} transactions ingested since the worker pool "
+                      "started; starting a new pool.")
+                # Tasks already queued finish on the old pool
+                _discard_executor(executor, cancel_futures=False)
+                executor = _get_executor()
+                published = _publish()
+        pool_future = executor.submit(task, submitted, deadline, published, *args)
+    except BrokenProcessPool:
+        _task_done(None)
+        _discard_executor(executor)
+        raise Overloaded("Worker pool restarted after a crash. Retry shortly.")
+    except BaseException:
+        _task_done(None)
+        raise
+    # Fires when the task really ends, even if the caller stopped waiting
+    pool_future.add_done_callback(_task_done)
+    return executor, pool_future
+
+
+async def _disconnected(request):
+    """Returns once the client of `request` has disconnected."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def run(task, *args, timeout, graph=False, request=None):
+    """
+    Runs task(submitted, deadline, published, *args) off the event loop and returns its result.
+
+    `graph=True` marks tasks that read the transaction graph, so workers are
+    brought up to date with ingested transactions first. With `request`,
+    the task is abandoned (Disconnected) if its client goes away. Stage
+    timings the task collected are recorded here, in the API process.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= OFFLOAD_MAX_PENDING:
+            raise Overloaded(f"Server busy: {_pending} CPU-bound requests already queued. Retry shortly.")
+        _pending += 1
+
+    submitted = time.time()
+    deadline = submitted + timeout
+    # Publishing waits on the ingest lock and copies rows, and starting a pool
+    # spawns processes, so none of it runs on the event loop. Shielded so the
+    # pending count is settled by _submit even if the caller is cancelled.
+    executor, pool_future = await asyncio.shield(
+        asyncio.to_thread(_submit, task, submitted, deadline, graph, args))
+
+    future = asyncio.wrap_future(pool_future)
+    watcher = asyncio.ensure_future(_disconnected(request)) if request is not None else None
+    try:
+        done, _ = await asyncio.wait([future] + ([watcher] if watcher else []), timeout=timeout,
+                                     return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+    if future not in done:
+        # Cancels the task if it hasn't started
+        future.cancel()
+        if watcher in done:
+            raise Disconnected("Client disconnected.")
+        raise TimedOut(f"Request did not finish within {timeout:g}s.")
+    try:
+        result, stages = future.result()
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        raise Overloaded("Worker pool restarted after a crash. Retry shortly.")
+    metrics.replay(stages)
+    if result is None:
+        # The worker picked the task up after its deadline and skipped it
+        raise TimedOut(f"Request did not finish within {timeout:g}s.")
+    return result
+
+
+def pending():
+    """Tasks currently queued or running."""
+    return _pending
+
+
+def start():
+    """Starts the pool and waits until every worker has loaded its state."""
+    executor = _get_executor()
+    if isinstance(executor, ProcessPoolExecutor):
+        for future in [executor.submit(_ping) for _ in range(OFFLOAD_WORKERS)]:
+            future.result()
+
+
+def warm(version):
+    """
+    Has the workers load a model version and build its explainer. Best
+    effort: a worker that doesn't get a warm-up task loads the version on
+    its first explain task instead.
+    """
+    executor = _executor
+    if isinstance(executor, ProcessPoolExecutor):
+        for future in [executor.submit(_warm_version, version) for _ in range(OFFLOAD_WORKERS)]:
+            future.result()
+
+
+def shutdown(wait=False):
+    """Stops the pool, cancelling queued tasks, and with `wait` until its workers exit. The next call starts a new one."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# --- Worker side ---
+
+_worker_shared = None
+_worker_shared_start = 0
+
+
+def _init_worker(data_path, store_path, shared, shared_start, ingested):
+    global _worker_shared, _worker_shared_start
+    _worker_shared = shared
+    _worker_shared_start = shared_start
+    graph_analysis.DATA_PATH = data_path
+    graph_analysis.STORE_PATH = store_path
+    try:
+        # The pool provides the parallelism; one booster thread per worker
+        model_registry.MODEL_THREADS = 1
+        get_explainer()
+    except FileNotFoundError:
+        pass  # explain tasks will report the missing model
+    graph_analysis.load_graph()
+    if ingested is not None:
+        # The ingest log replay may already cover some or all of them
+        for row in range(len(graph_analysis.senders.appended()), len(ingested[0])):
+            graph_analysis.append_edge(*(column[row].item() for column in ingested))
+
+
+def _ping():
+    return True
+
+
+def _warm_version(version):
+    get_explainer(model_registry.resolve(version))
+    return True
+
+
+def _catch_up(published):
+    """Replays transactions the API ingested since this worker last synced."""
+    have = len(graph_analysis.senders.appended())
+    if have >= published:
+        return
+    new_senders, new_receivers, new_amounts, new_timestamps = (
+        np.frombuffer(buffer, dtype=dtype) for buffer, dtype in zip(_worker_shared, _SHARED_DTYPES)
+    )
+    for row in range(have - _worker_shared_start, published - _worker_shared_start):
+        graph_analysis.append_edge(int(new_senders[row]), int(new_receivers[row]), float(new_amounts[row]),
+                                   int(new_timestamps[row]))
+
+
+def _start(submitted, deadline, published):
+    """Task prologue: False if the caller has given up, else syncs the graph if asked."""
+    now = time.time()
+    metrics.record("offload.queue_wait", max(now - submitted, 0.0))
+    if now > deadline:
+        return False
+    if published is not None:
+        with metrics.stage("offload.graph_sync"):
+            _catch_up(published)
+    return True
+
+
+def graph_task(submitted, deadline, published, account_id, params):
+    """graph_analysis.analyze_account_graph in a worker; returns (result, neighbourhood accounts)."""
+    with metrics.collect() as stages:
+        if not _start(submitted, deadline, published):
+            return None, stages
+        return graph_analysis.analyze_account_graph(account_id, with_accounts=True, **params), stages
+
+
+def explain_task(submitted, deadline, published, records, engine, version=None):
+    """SHAP explanations for a list of transaction dicts in a worker, from `version` (default: the active one)."""
+    with metrics.collect() as stages:
+        if not _start(submitted, deadline, published):
+            return None, stages
+        if version is not None:
+            with metrics.stage("offload.model_resolve"):
+                version = model_registry.resolve(version)
+        with metrics.stage("shap.frame"):
+            transaction_df = pd.DataFrame(records)[FEATURE_COLUMNS]
+        return get_shap_explanations(transaction_df, engine, version), stages
@@ -1,59 +1,108 @@
 # backend/shap_explainer.py
-import shap
 import pandas as pd
-import joblib
+import numpy as np
 import os
+import xgboost as xgb
 
-# Load the model and the EXACT training data
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models', 'model.pkl')
+from backend import column_store, metrics
+from backend.model_registry import get_active, BACKGROUND_PATH
+
+# The EXACT training data, used only when no precomputed background exists
 X_TRAIN_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'X_train.csv')
+BACKGROUND_SIZE = 100
 
-model = joblib.load(MODEL_PATH)
-X_train_background = pd.read_csv(X_TRAIN_PATH)
+# --- Explanation engines ---
+# "interventional": shap.TreeExplainer against the k-means background summary.
+# "native": exact path-dependent TreeSHAP computed by the XGBoost booster
+#           itself (pred_contribs), with no background data to evaluate.
+SHAP_ENGINES = ("interventional", "native")
+SHAP_ENGINE = os.environ.get("SHAP_ENGINE", "interventional")
 
-# --- FIX FOR InvalidMaskerError ---
-# 1. Summarize the data using kmeans
-background_summary_obj = shap.kmeans(X_train_background, 100)
 
-# 2. Convert the legacy DenseData object back into a proper Pandas DataFrame
-background_summary_df = pd.DataFrame(
-    background_summary_obj.data,
-    columns=X_train_background.columns
-)
+def summarize_background(X_train, size=BACKGROUND_SIZE):
+    """Summarizes training data into `size` k-means centroids for the explainer."""
+    import shap
 
-# 3. Create the explainer using the correctly formatted DataFrame
-explainer = shap.TreeExplainer(model, background_summary_df)
+    # --- FIX FOR InvalidMaskerError ---
+    # shap.kmeans returns a legacy DenseData object; convert it back into a
+    # proper Pandas DataFrame so TreeExplainer accepts it as background.
+    summary = shap.kmeans(X_train, size)
+    return pd.DataFrame(summary.data, columns=X_train.columns)
 
 
-def get_shap_explanation(transaction_df):
-    """Generates SHAP values for a single transaction."""
-    shap_values = explainer.shap_values(transaction_df)
-    
-    # Handle both binary and multi-class cases
+def load_background_summary():
+    """Loads the background summary saved by ml_model.train_model, or computes it."""
+    if os.path.exists(BACKGROUND_PATH):
+        return pd.read_csv(BACKGROUND_PATH)
+    print(f"Background summary not found at {BACKGROUND_PATH}; summarizing the training data instead.")
+    if column_store.exists(column_store.X_TRAIN_STORE):
+        return summarize_background(column_store.load_frame(column_store.X_TRAIN_STORE))
+    return summarize_background(pd.read_csv(X_TRAIN_PATH))
+
+
+def get_explainer(version=None):
+    """
+    Returns the interventional explainer of a model version (default: the
+    active one), building it on first use. Each version keeps its own, so
+    swapping in a new model never pairs it with the old model's explainer.
+    """
+    version = version or get_active()
+    if version.explainer is None:
+        with version.lock:
+            if version.explainer is None:
+                # shap takes over a second to import, so it is only pulled in
+                # here (normally by the API's background warm-up)
+                import shap
+                version.explainer = shap.TreeExplainer(version.model, load_background_summary())
+    return version.explainer
+
+
+def _fraud_class_matrix(shap_values):
+    """Normalizes explainer output to a (rows, features) matrix for the fraud class."""
     if isinstance(shap_values, list) and len(shap_values) > 1:
         # Multi-class case: use the fraud class (class 1)
-        explanation = dict(zip(transaction_df.columns, shap_values[1][0]))
-    else:
-        # Binary case: shap_values is a single array
-        # For binary classification, shap_values[0] contains values for both classes
-        # We want the values for the fraud class (class 1)
-        if len(shap_values[0].shape) > 1 and shap_values[0].shape[1] > 1:
-            # If it's a 2D array, take the second column (class 1)
-            explanation = dict(zip(transaction_df.columns, shap_values[0][:, 1]))
-        else:
-            # If it's a 1D array, use it directly
-            explanation = dict(zip(transaction_df.columns, shap_values[0]))
-    
-    # Convert numpy arrays to floats for JSON serialization
-    converted_explanation = {}
-    for k, v in explanation.items():
-        if hasattr(v, 'item') and v.size == 1:
-            converted_explanation[k] = float(v.item())
-        elif hasattr(v, 'tolist'):
-            converted_explanation[k] = float(v.tolist()[0]) if len(v.tolist()) == 1 else v.tolist()
-        else:
-            converted_explanation[k] = float(v) if isinstance(v, (int, float)) else v
-    
-    explanation = converted_explanation
-    
-    return explanation
\ No newline at end of file
+        return np.asarray(shap_values[1])
+    shap_values = np.asarray(shap_values)
+    if shap_values.ndim == 3:
+        # Per-class attributions stacked on the last axis: take class 1
+        return shap_values[:, :, 1]
+    return shap_values
+
+
+def _native_contributions(transaction_df, version):
+    """Per-feature contributions from the booster; drops the trailing bias column."""
+    contributions = version.model.get_booster().predict(xgb.DMatrix(transaction_df), pred_contribs=True)
+    return contributions[:, :-1]
+
+
+def compute_shap_matrix(transaction_df, engine=None, version=None):
+    """
+    Returns a (rows, features) matrix of fraud-class attributions from the
+    chosen engine, for a model version (default: the active one).
+    """
+    engine = engine or SHAP_ENGINE
+    version = version or get_active()
+    if engine == "native":
+        with metrics.stage("shap.native"):
+            return _native_contributions(transaction_df, version)
+    if engine == "interventional":
+        with metrics.stage("shap.interventional"):
+            return _fraud_class_matrix(get_explainer(version).shap_values(transaction_df))
+    raise ValueError(f"Unknown SHAP engine '{engine}'. Expected one of {SHAP_ENGINES}.")
+
+
+def get_shap_explanations(transaction_df, engine=None, version=None):
+    """Generates SHAP values for every row of a transaction block in one explainer pass."""
+    shap_values = compute_shap_matrix(transaction_df, engine, version)
+    columns = list(transaction_df.columns)
+
+    # Convert numpy values to floats for JSON serialization
+    return [
+        {column: float(value) for column, value in zip(columns, row)}
+        for row in shap_values.tolist()
+    ]
+
+
+def get_shap_explanation(transaction_df, engine=None, version=None):
+    """Generates SHAP values for a single transaction."""
+    return get_shap_explanations(transaction_df, engine, version)[0]
@@ -0,0 +1,135 @@
+# backend/stream_scoring.py
+"""
+Streaming file scoring pipeline.
+
+Reads a CSV or NDJSON export of transactions (the column layout written by
+create_data.py) in fixed-size chunks, scores each chunk with the trained
+model, explains only the rows over the threshold and bulk-writes them to the
+`cases` collection. Reading, scoring and writing run as three overlapping
+stages joined by bounded queues, so memory stays at a few chunks no matter
+how large the input is.
+
+Usage:
+    python -m backend.stream_scoring transactions.csv --chunk-size 50000
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from pymongo.errors import BulkWriteError
+
+from backend.db import build_case_document, case_collection
+from backend.inference import is_fraud
+from backend.model_registry import get_model, FEATURE_COLUMNS, FRAUD_THRESHOLD
+from backend.shap_explainer import get_shap_explanations
+
+DEFAULT_CHUNK_SIZE = 50000
+DEFAULT_QUEUE_DEPTH = 2  # chunks buffered between stages
+
+
+def read_chunks(path, chunk_size):
+    """Yields DataFrame chunks from a CSV or NDJSON file."""
+    if path.endswith(('.ndjson', '.jsonl', '.json')):
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        reader = pd.read_csv(path, chunksize=chunk_size)
+    with reader:
+        yield from reader
+
+
+def score_chunk(model, chunk, threshold):
+    """Scores a chunk and returns the case documents for the rows over the threshold."""
+    probabilities = model.predict_proba(chunk[FEATURE_COLUMNS])[:, 1]
+    # Same rule as the API, so batch and online decisions agree at the threshold
+    is_flagged = is_fraud(probabilities, threshold)
+    flagged = chunk[is_flagged]
+    if flagged.empty:
+        return []
+
+    explanations = get_shap_explanations(flagged[FEATURE_COLUMNS])
+    scores = probabilities[is_flagged].tolist()
+    return [
+        build_case_document(transaction, round(score, 4), explanation)
+        for transaction, score, explanation in zip(flagged.to_dict('records'), scores, explanations)
+    ]
+
+
+async def run_pipeline(path, chunk_size=DEFAULT_CHUNK_SIZE, threshold=FRAUD_THRESHOLD,
+                       queue_depth=DEFAULT_QUEUE_DEPTH, dry_run=False):
+    """Runs the read -> score -> write pipeline and returns summary statistics."""
+    model = get_model()
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(maxsize=queue_depth)
+    batches = asyncio.Queue(maxsize=queue_depth)
+    stats = {"rows": 0, "flagged": 0, "chunks": 0, "write_failures": 0}
+
+    # One thread each for parsing and scoring, so the two overlap with each
+    # other and with the Mongo writes awaited on the event loop.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        source = read_chunks(path, chunk_size)
+
+        async def read_stage():
+            while True:
+                chunk = await loop.run_in_executor(executor, next, source, None)
+                if chunk is None:
+                    break
+                await chunks.put(chunk)
+            await chunks.put(None)
+
+        async def score_stage():
+            while (chunk := await chunks.get()) is not None:
+                documents = await loop.run_in_executor(
+                    executor, score_chunk, model, chunk, threshold
+                )
+                stats["rows"] += len(chunk)
+                stats["chunks"] += 1
+                await batches.put(documents)
+            await batches.put(None)
+
+        async def write_stage():
+            while (documents := await batches.get()) is not None:
+                if documents and not dry_run:
+                    try:
+                        await case_collection.insert_many(documents, ordered=False)
+                    except BulkWriteError as e:
+                        # Unordered inserts keep going past failures; count them and carry on
+                        failures = len(e.details.get("writeErrors", []))
+                        stats["write_failures"] += failures
+                        print(f"Warning: {failures} of {len(documents)} cases in a batch were not written.")
+                stats["flagged"] += len(documents)
+
+        await asyncio.gather(read_stage(), score_stage(), write_stage())
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large transaction export and open cases for flagged rows.")
+    parser.add_argument('path', help="CSV or NDJSON (.ndjson/.jsonl) file of transactions.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--threshold', type=float, default=FRAUD_THRESHOLD,
+                        help="Fraud probability above which a row is explained and written as a case.")
+    parser.add_argument('--queue-depth', type=int, default=DEFAULT_QUEUE_DEPTH)
+    parser.add_argument('--dry-run', action='store_true', help="Score and explain without writing cases.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = asyncio.run(run_pipeline(
+        args.path,
+        chunk_size=args.chunk_size,
+        threshold=args.threshold,
+        queue_depth=args.queue_depth,
+        dry_run=args.dry_run
+    ))
+    elapsed = time.perf_counter() - start
+    print(f"Scored {stats['rows']} rows in {stats['chunks']} chunks ({stats['rows'] / max(elapsed, 1e-9):.0f} rows/s); "
+          f"flagged {stats['flagged']} in {elapsed:.1f}s.")
+    if stats["write_failures"]:
+        print(f"{stats['write_failures']} flagged cases could not be written.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/inference_paths.py
+"""
+Micro-benchmark of single-transaction scoring.
+
+Compares the original two-call pandas path (predict + predict_proba), the
+pandas fallback in backend.inference and the numpy/booster fast path, and
+reports p50/p99 latency for each. Also checks the paths agree.
+
+Usage:
+    python -m benchmarks.inference_paths --calls 5000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.inference import fraud_probability_fast, fraud_probability_pandas
+from backend.model_registry import get_model, FEATURE_COLUMNS
+from backend.shap_explainer import X_TRAIN_PATH
+
+
+def original_path(transaction):
+    """The pre-existing /predict scoring: one-row DataFrame, two model calls."""
+    model = get_model()
+    input_data = pd.DataFrame([transaction])[FEATURE_COLUMNS]
+    model.predict(input_data)
+    return float(model.predict_proba(input_data)[0][1])
+
+
+def fast_path(transaction):
+    return fraud_probability_fast(*(transaction[column] for column in FEATURE_COLUMNS))
+
+
+PATHS = {
+    "original (predict + predict_proba)": original_path,
+    "pandas fallback": fraud_probability_pandas,
+    "fast (numpy row + booster)": fast_path,
+}
+
+
+def measure(fn, transactions):
+    """Per-call latencies in microseconds, plus the scores."""
+    latencies = np.empty(len(transactions))
+    scores = np.empty(len(transactions))
+    for i, transaction in enumerate(transactions):
+        start = time.perf_counter()
+        scores[i] = fn(transaction)
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return latencies, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-transaction inference paths.")
+    parser.add_argument('--calls', type=int, default=5000)
+    args = parser.parse_args()
+
+    X = pd.read_csv(X_TRAIN_PATH)
+    transactions = X.sample(n=args.calls, replace=True, random_state=42).to_dict('records')
+
+    scores = {}
+    for name, fn in PATHS.items():
+        measure(fn, transactions[:100])  # warm-up
+        latencies, scores[name] = measure(fn, transactions)
+        print(f"{name:>36}: p50 {np.percentile(latencies, 50):8.1f} us, "
+              f"p99 {np.percentile(latencies, 99):8.1f} us, mean {latencies.mean():8.1f} us")
+
+    reference = scores["original (predict + predict_proba)"]
+    for name, values in scores.items():
+        print(f"{name:>36}: max |score - original| = {np.abs(values - reference).max():.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# benchmarks/load_test.py
+"""
+Load-test suite for the API.
+
+For each dataset size, generates transactions with create_data.generate_data,
+loads them into graph_analysis, and drives /predict, /graph_analysis and the
+/cases endpoints with concurrent clients against the in-process app. Mongo
+is replaced by mongomock-motor so no database is needed; it neither uses
+indexes nor does real I/O, so /cases numbers are for comparing runs, not
+for sizing a Mongo deployment. Every scenario is
+emitted as one JSON line (throughput and latency percentiles), so runs can
+be diffed or loaded into a DataFrame.
+
+The graph result cache is cleared before every scenario and concurrency
+level, so no run is served from results an earlier one computed. Each
+record reports the cache hits and misses of its own run.
+
+Requires the benchmark extras:
+    pip install mongomock-motor httpx
+
+Usage:
+    python -m benchmarks.load_test --sizes 10000 1000000 10000000 --output bench_results.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+from mongomock_motor import AsyncMongoMockClient
+
+from backend import db, graph_analysis, main, offload
+from backend.graph_cache import graph_results
+from backend.shap_explainer import get_explainer
+from create_data import generate_data
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+SEED_CASES = 1000
+
+
+def prepare_dataset(rows, directory):
+    """Generates (or reuses) the dataset for `rows` transactions."""
+    path = os.path.join(directory, f"transactions_{rows}.csv")
+    if not os.path.exists(path):
+        generate_data(rows, output_path=path)
+    return path
+
+
+def load_dataset(path):
+    """Points graph_analysis at a dataset and builds its graph."""
+    graph_analysis.DATA_PATH = path
+    graph_analysis.STORE_PATH = None  # read the generated CSV, not a converted store
+    graph_analysis.index = None  # mark as not loaded so load_graph() reads the new file
+    graph_analysis.features = None
+    offload.shutdown()  # pool workers load the graph of the dataset current when they start
+    start = time.perf_counter()
+    graph_analysis.load_graph()
+    elapsed = time.perf_counter() - start
+    offload.start()
+    return elapsed
+
+
+async def drive(client, make_request, concurrency, requests_per_client):
+    """Runs `concurrency` clients each issuing `requests_per_client` requests."""
+    latencies = []
+    errors = 0
+
+    async def client_loop(client_id):
+        nonlocal errors
+        rng = random.Random(client_id)
+        for _ in range(requests_per_client):
+            method, url, kwargs = make_request(rng)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            # The API reports some failures as {"error": ...} with a 200 status
+            body = response.json()
+            if response.status_code >= 400 or (isinstance(body, dict) and "error" in body):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p90": round(float(np.percentile(latencies, 90)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+            "max": round(float(latencies.max()), 3),
+        },
+    }
+
+
+def scenarios(account_ids):
+    """Request generators for each endpoint under test."""
+    transactions = pd.DataFrame({
+        "amount": np.random.lognormal(3.5, 1.5, 1000).round(2),
+        "sender_account_age": np.random.randint(1, 3650, 1000),
+        "receiver_account_age": np.random.randint(1, 3650, 1000),
+    }).to_dict("records")
+    case = {"transaction_details": {"amount": 100.0}, "risk_score": 0.9, "explanation": {"amount": 0.5}}
+
+    generators = {
+        "predict": lambda rng: ("POST", "/predict", {"json": rng.choice(transactions)}),
+        "predict_no_explain": lambda rng: ("POST", "/predict", {"json": rng.choice(transactions),
+                                                                "params": {"explain": "false"}}),
+        "graph_analysis": lambda rng: ("GET", f"/graph_analysis/{rng.choice(account_ids)}", {}),
+        "graph_analysis_depth2": lambda rng: ("GET", f"/graph_analysis/{rng.choice(account_ids)}",
+                                              {"params": {"depth": 2, "time_budget": 0.5}}),
+        "cases_list": lambda rng: ("GET", "/cases", {"params": {"limit": 50}}),
+        "cases_create": lambda rng: ("POST", "/cases", {"json": case}),
+    }
+    # Heavy graph queries interleaved with cheap Mongo reads, for tail latency under mixed load
+    mixed = [generators["graph_analysis_depth2"], generators["predict"], generators["cases_list"]]
+    generators["mixed"] = lambda rng: rng.choice(mixed)(rng)
+    return generators
+
+
+async def run_size(rows, path, args):
+    """Runs every scenario against one dataset size and returns the result records."""
+    load_s = load_dataset(path)
+    account_ids = graph_analysis.index.accounts()
+    account_ids = np.random.choice(account_ids, size=min(1000, len(account_ids)), replace=False).tolist()
+
+    # Fresh in-memory Mongo per size, seeded so /cases has pages to read
+    db.case_collection = AsyncMongoMockClient().aml_system.cases
+    await db.ensure_indexes()
+    seed = {"transaction_details": {"amount": 1.0}, "risk_score": 0.5, "explanation": {"amount": 0.1}}
+    await db.create_cases_bulk([seed] * SEED_CASES)
+
+    records = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, make_request in scenarios(account_ids).items():
+            if args.only and name not in args.only:
+                continue
+            for concurrency in args.concurrency:
+                graph_results.clear()
+                before = graph_results.stats()
+                result = await drive(client, make_request, concurrency, args.requests)
+                after = graph_results.stats()
+                record = {
+                    "dataset_rows": rows,
+                    "graph_load_s": round(load_s, 3),
+                    "scenario": name,
+                    "concurrency": concurrency,
+                    **result,
+                    "graph_cache": {field: after[field] - before[field] for field in ("hits", "misses")},
+                }
+                records.append(record)
+                print(json.dumps(record), flush=True)
+    return records
+
+
+async def run(args):
+    main.load_model()
+    get_explainer()
+    meta = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "offload": {"mode": offload.OFFLOAD_MODE, "workers": offload.OFFLOAD_WORKERS},
+    }
+    print(json.dumps({"run": meta}), flush=True)
+
+    records = []
+    for rows in args.sizes:
+        path = prepare_dataset(rows, args.data_dir)
+        records.extend(await run_size(rows, path, args))
+    offload.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps({"run": meta}) + "\n")
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        print(f"Wrote {len(records)} results to {args.output}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load-test the AML API in-process.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Dataset sizes in rows.")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16], help="Concurrent clients.")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per client per scenario.")
+    parser.add_argument('--only', nargs='*', help="Run only these scenarios.")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'aml_bench_data'),
+                        help="Where generated datasets are cached between runs.")
+    parser.add_argument('--output', help="Write all results as JSON lines to this file.")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,69 @@
+# benchmarks/shap_engines.py
+"""
+Compares the SHAP explanation engines in backend.shap_explainer.
+
+Reports latency for single-row and block explanations, and how closely the
+native booster contributions agree with the interventional explainer.
+
+Usage:
+    python -m benchmarks.shap_engines --rows 2000 --repeats 50
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.shap_explainer import SHAP_ENGINES, X_TRAIN_PATH, compute_shap_matrix
+
+
+def time_call(fn, repeats):
+    """Returns the per-call latencies of fn() in milliseconds."""
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def agreement(reference, candidate):
+    """Agreement statistics between two (rows, features) attribution matrices."""
+    top_match = np.argmax(np.abs(reference), axis=1) == np.argmax(np.abs(candidate), axis=1)
+    sign_match = np.sign(reference) == np.sign(candidate)
+    return {
+        "pearson_r": float(np.corrcoef(reference.ravel(), candidate.ravel())[0, 1]),
+        "mean_abs_diff": float(np.mean(np.abs(reference - candidate))),
+        "top_feature_agreement": float(top_match.mean()),
+        "sign_agreement": float(sign_match.mean())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SHAP explanation engines.")
+    parser.add_argument('--rows', type=int, default=2000, help="Rows in the block benchmark.")
+    parser.add_argument('--repeats', type=int, default=50, help="Timed calls per single-row benchmark.")
+    args = parser.parse_args()
+
+    X = pd.read_csv(X_TRAIN_PATH)
+    block = X.sample(n=min(args.rows, len(X)), random_state=42).reset_index(drop=True)
+    single = block.iloc[[0]]
+
+    results = {}
+    for engine in SHAP_ENGINES:
+        compute_shap_matrix(single, engine)  # warm-up
+        single_ms = time_call(lambda: compute_shap_matrix(single, engine), args.repeats)
+        start = time.perf_counter()
+        results[engine] = compute_shap_matrix(block, engine)
+        block_s = time.perf_counter() - start
+        print(f"{engine:>15}: single-row p50 {np.percentile(single_ms, 50):8.3f} ms, "
+              f"p99 {np.percentile(single_ms, 99):8.3f} ms; "
+              f"{len(block)} rows in {block_s:.3f} s ({len(block) / block_s:,.0f} rows/s)")
+
+    stats = agreement(results["interventional"], results["native"])
+    print("Agreement (native vs interventional): " + ", ".join(f"{k}={v:.4f}" for k, v in stats.items()))
+
+
+if __name__ == '__main__':
+    main()
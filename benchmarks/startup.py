@@ -0,0 +1,67 @@
+# benchmarks/startup.py
+"""
+Measures API worker startup.
+
+Each run starts a fresh interpreter, imports backend.main, runs the startup
+events and reports how long it took until the worker can take requests,
+and until the first /predict and /graph_analysis responses (which wait on
+any warm-up still in progress).
+
+Usage:
+    python -m benchmarks.startup --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, time
+start = time.perf_counter()
+from backend import main, offload
+from fastapi.testclient import TestClient
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    client.post("/predict", json={"amount": 100.0, "sender_account_age": 30, "receiver_account_age": 400})
+    first_predict = time.perf_counter()
+    client.get("/graph_analysis/1858")
+    first_graph = time.perf_counter()
+    # Pool workers outlive os._exit below and would hold our output pipe open
+    offload.shutdown(wait=True)
+print("STARTUP " + json.dumps({
+    "import_s": imported - start,
+    "ready_s": ready - start,
+    "first_predict_s": first_predict - start,
+    "first_graph_s": first_graph - start,
+}), flush=True)
+# Skip interpreter teardown, which can wait on driver threads (e.g. no local Mongo)
+import os; os._exit(0)
+'''
+
+
+def run_once():
+    """Runs the probe in a fresh interpreter and returns its timings."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], capture_output=True, text=True, check=True
+    ).stdout
+    # Background warm-up may print around the result, so pick out its line
+    line = next(line for line in output.splitlines() if line.startswith("STARTUP "))
+    return json.loads(line[len("STARTUP "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API worker startup time.")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        print(f"{key:>16}: median {statistics.median(values):.3f} s, max {max(values):.3f} s")
+
+
+if __name__ == '__main__':
+    main()
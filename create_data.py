@@ -2,10 +2,31 @@
 
 import pandas as pd
 import numpy as np
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_data(num_rows=10000):
-    """Generates a synthetic transaction dataset with 6 columns."""
+COLUMNS = ['amount', 'sender_account_age', 'receiver_account_age', 'is_fraud', 'sender_account_id', 'receiver_account_id', 'timestamp']
+
+# --- Transaction times (Unix seconds) ---
+START_TIME = 1_704_067_200     # 2024-01-01T00:00:00Z
+DEFAULT_SPAN_DAYS = 365        # transactions are spread over this many days
+HOP_DELAY = (600, 6 * 3600)    # seconds between consecutive hops of a ring or layering chain
+FAN_IN_WINDOW = 3 * 86400      # smurfing deposits land within this many seconds
+
+# --- Planted laundering typologies (partitioned generator) ---
+TYPOLOGIES = {"none": 0, "ring": 1, "fan_in": 2, "layering": 3}
+DEFAULT_TYPOLOGIES_PER_MILLION = {"ring": 20, "fan_in": 20, "layering": 20}
+RING_SIZE = (3, 6)             # accounts per ring
+FAN_IN_SIZE = (10, 30)         # smurfs feeding one collector
+LAYERING_LENGTH = (3, 7)       # hops from source to sink
+DEFAULT_TYPOLOGY_SIZES = {"ring": RING_SIZE, "fan_in": FAN_IN_SIZE, "layering": LAYERING_LENGTH}
+MIN_TYPOLOGY_SIZE = {"ring": 2, "fan_in": 1, "layering": 1}
+STRUCTURING_LIMIT = 10000.0    # smurfing deposits stay just under this
+DEFAULT_PARTITION_ROWS = 5_000_000
+
+def generate_data(num_rows=10000, output_path=os.path.join('data', 'synthetic_data.csv'), span_days=DEFAULT_SPAN_DAYS):
+    """Generates a synthetic transaction dataset with 7 columns, in time order, and writes it to `output_path`."""
     print(f"Generating {num_rows} synthetic transactions...")
     
     # Generate unique account IDs
@@ -23,7 +44,8 @@ def generate_data(num_rows=10000):
         'receiver_account_age': np.random.randint(1, 3650, size=num_rows),
         'is_fraud': np.random.choice([0, 1], size=num_rows, p=[0.98, 0.02]),
         'sender_account_id': sender_ids,
-        'receiver_account_id': receiver_ids
+        'receiver_account_id': receiver_ids,
+        'timestamp': START_TIME + np.sort(np.random.randint(0, span_days * 86400, size=num_rows))
     }
     
     df = pd.DataFrame(data)
@@ -33,15 +55,195 @@ def generate_data(num_rows=10000):
     df.loc[fraud_indices, 'amount'] *= np.random.uniform(5, 20, size=len(fraud_indices))
     df.loc[fraud_indices, 'sender_account_age'] = np.random.randint(1, 30, size=len(fraud_indices))
     
-    # Define the output path
-    output_path = os.path.join('data', 'synthetic_data.csv')
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Create the output directory
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
     
     # Reorder columns to a logical format
-    df = df[['amount', 'sender_account_age', 'receiver_account_age', 'is_fraud', 'sender_account_id', 'receiver_account_id']]
+    df = df[COLUMNS]
     
     df.to_csv(output_path, index=False)
-    print(f"Successfully created '{output_path}' with 6 columns.")
+    print(f"Successfully created '{output_path}' with 7 columns.")
+    return output_path
+
+def _background_rows(rng, num_rows, num_accounts, span):
+    """Random transfers between random accounts, with the same fraud profile as generate_data."""
+    sender_ids = rng.integers(1000, 1000 + num_accounts, size=num_rows)
+    receiver_ids = rng.integers(1000, 1000 + num_accounts, size=num_rows)
+    receiver_ids[sender_ids == receiver_ids] += 1
+
+    is_fraud = (rng.random(num_rows) < 0.02).astype(np.int8)
+    amount = rng.lognormal(mean=3.5, sigma=1.5, size=num_rows)
+    sender_age = rng.integers(1, 3650, size=num_rows)
+    fraud = is_fraud == 1
+    amount[fraud] *= rng.uniform(5, 20, size=fraud.sum())
+    sender_age[fraud] = rng.integers(1, 30, size=fraud.sum())
+
+    return {
+        'amount': amount.round(2),
+        'sender_account_age': sender_age,
+        'receiver_account_age': rng.integers(1, 3650, size=num_rows),
+        'is_fraud': is_fraud,
+        'sender_account_id': sender_ids,
+        'receiver_account_id': receiver_ids,
+        'timestamp': rng.integers(START_TIME, START_TIME + span, size=num_rows)
+    }
+
+
+def _plant_typology(rng, kind, num_accounts, span, size_range):
+    """
+    Returns (accounts, senders, receivers, amounts, timestamps) for one
+    planted structure, its size drawn from the inclusive `size_range`. Ring
+    and layering hops happen in order, a few hours apart; fan-in deposits
+    land within a few days.
+    """
+    if kind == "ring":
+        size = rng.integers(size_range[0], size_range[1] + 1)
+        accounts = rng.choice(num_accounts, size=size, replace=False) + 1000
+        senders, receivers = accounts, np.roll(accounts, -1)
+        amounts = rng.uniform(5000, 50000) * rng.uniform(0.9, 1.0, size=size)
+    elif kind == "fan_in":
+        size = rng.integers(size_range[0], size_range[1] + 1)
+        accounts = rng.choice(num_accounts, size=size + 1, replace=False) + 1000
+        senders, receivers = accounts[1:], np.full(size, accounts[0])
+        amounts = rng.uniform(0.8, 0.999, size=size) * STRUCTURING_LIMIT
+    elif kind == "layering":
+        length = rng.integers(size_range[0], size_range[1] + 1)
+        accounts = rng.choice(num_accounts, size=length + 1, replace=False) + 1000
+        senders, receivers = accounts[:-1], accounts[1:]
+        # Each hop skims a small fee off the amount passed along
+        amounts = rng.uniform(10000, 100000) * np.cumprod(rng.uniform(0.95, 0.99, size=length))
+    else:
+        raise ValueError(f"Unknown typology '{kind}'.")
+    start = rng.integers(START_TIME, START_TIME + span)
+    if kind == "fan_in":
+        timestamps = start + np.sort(rng.integers(0, FAN_IN_WINDOW, size=len(senders)))
+    else:
+        timestamps = start + np.cumsum(rng.integers(HOP_DELAY[0], HOP_DELAY[1], size=len(senders)))
+    return accounts, senders, receivers, amounts, timestamps
+
+
+def generate_partition(partition_id, num_rows, num_accounts, output_dir, seed, typologies_per_million,
+                       span_days=DEFAULT_SPAN_DAYS, typology_sizes=DEFAULT_TYPOLOGY_SIZES):
+    """
+    Generates one partition of transactions with planted typologies and writes
+    it as a Parquet file. Returns the ground-truth manifest for the partition.
+    """
+    rng = np.random.default_rng([seed, partition_id])
+    span = span_days * 86400
+    columns = _background_rows(rng, num_rows, num_accounts, span)
+    columns['typology'] = np.zeros(num_rows, dtype=np.int8)
+    columns['typology_id'] = np.full(num_rows, -1, dtype=np.int64)
+
+    planted = {name: [] for name in columns}
+    manifest = []
+    for kind, per_million in typologies_per_million.items():
+        for _ in range(rng.poisson(per_million * num_rows / 1_000_000)):
+            typology_id = partition_id * 1_000_000 + len(manifest)
+            accounts, senders, receivers, amounts, timestamps = _plant_typology(rng, kind, num_accounts, span,
+                                                                            typology_sizes[kind])
+            n = len(senders)
+            planted['amount'].append(amounts.round(2))
+            planted['sender_account_age'].append(rng.integers(1, 3650, size=n))
+            planted['receiver_account_age'].append(rng.integers(1, 3650, size=n))
+            planted['is_fraud'].append(np.ones(n, dtype=np.int8))
+            planted['sender_account_id'].append(senders)
+            planted['receiver_account_id'].append(receivers)
+            planted['timestamp'].append(timestamps)
+            planted['typology'].append(np.full(n, TYPOLOGIES[kind], dtype=np.int8))
+            planted['typology_id'].append(np.full(n, typology_id, dtype=np.int64))
+            manifest.append({
+                'typology_id': typology_id,
+                'typology': kind,
+                'accounts': '|'.join(str(a) for a in accounts.tolist()),
+                'partition': partition_id
+            })
+
+    if manifest:
+        columns = {name: np.concatenate([values] + planted[name]) for name, values in columns.items()}
+    # Time order, ties broken at random, which also spreads planted transfers through the partition
+    order = np.lexsort((rng.permutation(len(columns['amount'])), columns['timestamp']))
+    df = pd.DataFrame({name: values[order] for name, values in columns.items()})
+
+    df.to_parquet(os.path.join(output_dir, f"part-{partition_id:05d}.parquet"), index=False)
+    return manifest
+
+
+def generate_dataset(num_rows, output_dir, partition_rows=DEFAULT_PARTITION_ROWS, workers=None,
+                     seed=42, typologies_per_million=None, span_days=DEFAULT_SPAN_DAYS, typology_sizes=None):
+    """
+    Generates `num_rows` background transactions as partitioned Parquet files
+    in `output_dir`, in parallel and one partition in memory per worker, with
+    rings, smurfing fan-ins and layering chains planted in every partition.
+    Ground truth is kept per row (`typology`, `typology_id`) and listed in
+    _typologies.csv (the underscore keeps Parquet readers from scanning it).
+
+    `typologies_per_million` and `typology_sizes` override the planted
+    density and the inclusive (min, max) size range of any typology.
+    """
+    typologies_per_million = {**DEFAULT_TYPOLOGIES_PER_MILLION, **(typologies_per_million or {})}
+    typology_sizes = {**DEFAULT_TYPOLOGY_SIZES, **(typology_sizes or {})}
+    num_accounts = max(num_rows // 2, 1000)
+    for kind, (low, high) in typology_sizes.items():
+        if kind not in TYPOLOGIES:
+            raise ValueError(f"Unknown typology '{kind}'.")
+        # A fan-in also draws its collector, and a chain one more account than it has hops
+        accounts = high + (kind != "ring")
+        if not MIN_TYPOLOGY_SIZE[kind] <= low <= high or accounts > num_accounts:
+            raise ValueError(f"Invalid {kind} size range {low}-{high}: need {MIN_TYPOLOGY_SIZE[kind]} <= min <= max "
+                             f"and at most {num_accounts} accounts.")
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = [partition_rows] * (num_rows // partition_rows)
+    if num_rows % partition_rows:
+        sizes.append(num_rows % partition_rows)
+
+    print(f"Generating {num_rows} transactions in {len(sizes)} partitions...")
+    manifest = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(generate_partition, i, size, num_accounts, output_dir, seed, typologies_per_million,
+                        span_days, typology_sizes)
+            for i, size in enumerate(sizes)
+        ]
+        for future in futures:
+            manifest.extend(future.result())
+
+    manifest_path = os.path.join(output_dir, '_typologies.csv')
+    pd.DataFrame(manifest, columns=['typology_id', 'typology', 'accounts', 'partition']).to_csv(manifest_path, index=False)
+    print(f"Successfully created {len(sizes)} partitions in '{output_dir}' with {len(manifest)} planted typologies.")
+    return output_dir
+
 
 if __name__ == '__main__':
-    generate_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic transaction data.")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--output-dir', help="Write partitioned Parquet with planted typologies here "
+                                             "instead of data/synthetic_data.csv.")
+    parser.add_argument('--partition-rows', type=int, default=DEFAULT_PARTITION_ROWS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--span-days', type=int, default=DEFAULT_SPAN_DAYS,
+                        help="Spread transaction timestamps over this many days.")
+    # Planted typologies, with --output-dir only
+    for kind, flag in (("ring", "rings"), ("fan_in", "fan-ins"), ("layering", "layering-chains")):
+        parser.add_argument(f'--{flag}-per-million', dest=f'{kind}_per_million', type=float, metavar='RATE',
+                            default=DEFAULT_TYPOLOGIES_PER_MILLION[kind],
+                            help=f"Expected {kind.replace('_', '-')} typologies planted per million rows.")
+    parser.add_argument('--ring-size', type=int, nargs=2, metavar=('MIN', 'MAX'), default=RING_SIZE,
+                        help="Accounts per ring.")
+    parser.add_argument('--fan-in-size', type=int, nargs=2, metavar=('MIN', 'MAX'), default=FAN_IN_SIZE,
+                        help="Smurfs feeding one collector.")
+    parser.add_argument('--layering-length', type=int, nargs=2, metavar=('MIN', 'MAX'), default=LAYERING_LENGTH,
+                        help="Hops from source to sink of a layering chain.")
+    args = parser.parse_args()
+
+    if args.output_dir:
+        generate_dataset(
+            args.rows, args.output_dir, partition_rows=args.partition_rows, workers=args.workers,
+            seed=args.seed, span_days=args.span_days,
+            typologies_per_million={kind: getattr(args, f'{kind}_per_million')
+                                    for kind in DEFAULT_TYPOLOGIES_PER_MILLION},
+            typology_sizes={"ring": tuple(args.ring_size), "fan_in": tuple(args.fan_in_size),
+                            "layering": tuple(args.layering_length)}
+        )
+    else:
+        generate_data(args.rows, span_days=args.span_days)
@@ -3,6 +3,10 @@
 import streamlit as st
 import requests
 import json
+import threading
+import time
+import datetime
+from collections import deque
 import pandas as pd
 import networkx as nx
 import plotly.graph_objects as go
@@ -18,6 +22,19 @@ st.set_page_config(
 PREDICT_API_URL = "http://127.0.0.1:8000/predict"
 GRAPH_API_URL = "http://127.0.0.1:8000/graph_analysis/"
 CASES_API_URL = "http://127.0.0.1:8000/cases"
+CASES_STREAM_URL = "http://127.0.0.1:8000/cases/stream"
+
+CASE_STATUSES = ["Open", "In Review", "Escalated", "Closed - False Positive"]
+CASES_PAGE_SIZE = 50
+CASE_FEED_HISTORY = 2000  # case events kept for sessions to catch up from
+CASE_FEED_REFRESH = 3  # seconds between live case table refreshes
+CASE_FEED_RETRY = 2  # seconds before reconnecting a dropped case stream
+
+# --- Graph view ---
+GRAPH_EDGE_LIMIT = 300  # default edges drawn; the API keeps the highest-value ones
+GRAPH_MAX_EDGE_LIMIT = 5000  # the API's own cap
+GRAPH_LABEL_LIMIT = 40  # above this many nodes, account IDs show on hover only
+GRAPH_CACHE_TTL = 60  # seconds; ingested transactions show up after this
 
 # --- Helper Functions ---
 def display_shap_chart(explanation):
@@ -27,12 +44,243 @@ def display_shap_chart(explanation):
     if not df_exp_pos.empty:
         st.bar_chart(df_exp_pos)
 
+@st.cache_data(ttl=GRAPH_CACHE_TTL, max_entries=64, show_spinner="Loading transaction network...")
+def fetch_graph(account_id, limit):
+    """Columnar graph analysis for an account, memoized across reruns."""
+    response = requests.get(
+        f"{GRAPH_API_URL}{account_id}", params={"limit": limit, "format": "columnar"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+@st.cache_data(max_entries=64, show_spinner="Laying out network...")
+def compute_layout(node_ids, sources, targets):
+    """Spring layout positions (xs, ys) in node order; cached per distinct graph."""
+    G = nx.DiGraph()
+    G.add_nodes_from(node_ids)
+    G.add_edges_from(zip(sources, targets))
+    # Fixed seed: the same neighbourhood always gets the same picture
+    pos = nx.spring_layout(G, seed=42)
+    return [pos[node][0] for node in node_ids], [pos[node][1] for node in node_ids]
+
+
+def build_graph_figure(graph_data, account_id):
+    """Plotly figure with every edge in one WebGL line trace."""
+    node_ids = graph_data["nodes"]["id"]
+    edges = graph_data["edges"]
+    xs, ys = compute_layout(tuple(node_ids), tuple(edges["source"]), tuple(edges["target"]))
+    position = {node: i for i, node in enumerate(node_ids)}
+
+    # One polyline for all edges, segments separated by gaps
+    edge_x, edge_y = [], []
+    mid_x, mid_y, mid_text = [], [], []
+    for source, target, count, amount in zip(edges["source"], edges["target"], edges["count"], edges["amount"]):
+        s, t = position[source], position[target]
+        edge_x += [xs[s], xs[t], None]
+        edge_y += [ys[s], ys[t], None]
+        mid_x.append((xs[s] + xs[t]) / 2)
+        mid_y.append((ys[s] + ys[t]) / 2)
+        mid_text.append(f"{source} → {target}<br>${amount:,.2f} over {count} transfer(s)")
+
+    focus = int(account_id) if account_id.isdigit() else None
+    show_labels = len(node_ids) <= GRAPH_LABEL_LIMIT
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=edge_x, y=edge_y, mode="lines",
+        line=dict(width=1, color="rgba(70, 100, 200, 0.5)"),
+        hoverinfo="none"
+    ))
+    # Invisible midpoints carry the edge hover text
+    fig.add_trace(go.Scattergl(
+        x=mid_x, y=mid_y, mode="markers",
+        marker=dict(size=6, opacity=0),
+        text=mid_text, hoverinfo="text"
+    ))
+    fig.add_trace(go.Scattergl(
+        x=xs, y=ys, mode="markers+text" if show_labels else "markers",
+        marker=dict(
+            size=25 if show_labels else 8,
+            color=["red" if node == focus else "skyblue" for node in node_ids]
+        ),
+        text=[str(node) for node in node_ids],
+        textposition="middle center",
+        hoverinfo="text"
+    ))
+    fig.update_layout(
+        title=f"Transaction Network for Account {account_id}",
+        showlegend=False,
+        margin=dict(l=0, r=0, b=0, t=40),
+        height=500,
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False)
+    )
+    return fig
+
+# --- Live case feed ---
+
+def parse_event_id(event_id):
+    """Splits a case event ID or /cases ETag ("<boot>-<seq>[.<version>]") into (boot, seq)."""
+    boot, _, seq = event_id.strip('W/"').partition(".")[0].partition("-")
+    return boot, int(seq)
+
+
+class CaseFeed:
+    """
+    Reads the API's case event stream in a background thread.
+
+    One feed is shared by every session of this Streamlit server; sessions
+    patch their case table from it instead of re-listing cases.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self.epoch = 0  # bumped when sessions must reload: a fresh connection or a reset
+        self._events = deque(maxlen=CASE_FEED_HISTORY)  # (boot, seq, case)
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, name="case-feed", daemon=True).start()
+
+    def _run(self):
+        last_id = None
+        while True:
+            try:
+                headers = {"Last-Event-ID": last_id} if last_id else {}
+                with requests.get(CASES_STREAM_URL, headers=headers, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    if last_id is None:
+                        # Nothing says what happened before this connection
+                        with self._lock:
+                            self.epoch += 1
+                    self.connected = True
+                    event = {}
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line:
+                            field, _, value = line.partition(": ")
+                            event[field] = value
+                            continue
+                        if "id" in event:
+                            last_id = event["id"]
+                            with self._lock:
+                                if event.get("event") == "reset":
+                                    # The buffered events can no longer be trusted to be complete
+                                    self._events.clear()
+                                    self.epoch += 1
+                                else:
+                                    self._events.append((*parse_event_id(last_id), json.loads(event["data"])))
+                        event = {}
+            except requests.exceptions.RequestException:
+                pass
+            self.connected = False
+            time.sleep(CASE_FEED_RETRY)
+
+    def since(self, event_id):
+        """Cases changed after `event_id` with their event IDs, or None if some were missed."""
+        boot, seq = parse_event_id(event_id)
+        with self._lock:
+            events = list(self._events)
+        if events and events[-1][0] != boot:
+            return None  # the API restarted
+        newer = [(s, case) for b, s, case in events if b == boot and s > seq]
+        if [s for s, _ in newer] != list(range(seq + 1, seq + 1 + len(newer))):
+            return None  # the feed connected after, or dropped, some of them
+        return [(f"{boot}-{s}", case) for s, case in newer]
+
+
+@st.cache_resource
+def get_case_feed():
+    return CaseFeed()
+
+
+def load_cases(params):
+    """Fetches a page of cases into the session with a conditional GET."""
+    page = st.session_state.case_page
+    # Read before the request, so a reset that races it forces another reload
+    epoch = get_case_feed().epoch
+    headers = {}
+    if page is not None and page["params"] == params:
+        headers["If-None-Match"] = page["etag"]
+    response = requests.get(CASES_API_URL, params=params, headers=headers)
+    if response.status_code == 304:
+        # Still current, so the feed resumes from the list's own event ID
+        page["event_id"] = page["etag"]
+        page["epoch"] = epoch
+        return
+    response.raise_for_status()
+    page_data = response.json()
+    st.session_state.case_page = {
+        "params": params,
+        "etag": response.headers["ETag"],
+        "event_id": response.headers["ETag"],  # advanced by feed events; the ETag is kept as sent
+        "epoch": epoch,
+        "cases": page_data.get("cases", []),
+        "next_cursor": page_data.get("next_cursor")
+    }
+
+
+def case_order(row):
+    return datetime.datetime.fromisoformat(row["created_at"]), row["_id"]
+
+
+def apply_case_change(page, case):
+    """Patches one created or updated case into the session's page."""
+    params = page["params"]
+    rows = [row for row in page["cases"] if row["_id"] != case["_id"]]
+    was_listed = len(rows) != len(page["cases"])
+    matches = params.get("status") in (None, case["status"]) and case["risk_score"] >= params.get("min_risk_score", 0)
+    # New cases sort first, so only the first page gains rows
+    belongs = was_listed or ("cursor" not in params and (
+        page["next_cursor"] is None or (rows and case_order(case) >= case_order(rows[-1]))
+    ))
+    if matches and belongs:
+        rows.append(case)
+        rows.sort(key=case_order, reverse=True)
+    page["cases"] = rows
+
+
+def sync_cases(params):
+    """
+    Brings the session's page up to date from the case feed.
+
+    The list is only fetched again when the feed can't account for every
+    change since it was loaded: new filters, a fresh connection or reset,
+    missed events, or no connection at all (then every refresh revalidates).
+    """
+    page = st.session_state.case_page
+    feed = get_case_feed()
+    if page is None or page["params"] != params or not feed.connected or page["epoch"] != feed.epoch:
+        load_cases(params)
+        return
+    changes = feed.since(page["event_id"])
+    if changes is None:
+        load_cases(params)
+        return
+    for event_id, case in changes:
+        apply_case_change(page, case)
+        page["event_id"] = event_id
+
+
+@st.fragment(run_every=CASE_FEED_REFRESH)
+def live_case_table(params):
+    """The case table, patched from the live feed every few seconds."""
+    sync_cases(params)
+    cases = st.session_state.case_page["cases"]
+    if not cases:
+        st.info("No cases found.")
+    else:
+        st.write("All open and reviewed cases:")
+        st.dataframe(pd.DataFrame(cases)[['_id', 'status', 'risk_score', 'created_at']])
+
 # --- Main App Logic ---
 st.sidebar.title("AML Dashboard Navigation")
 page = st.sidebar.radio("Go to", ["Live Transaction Analysis", "Case Management"])
 
 if "last_analysis" not in st.session_state:
     st.session_state.last_analysis = None
+if "graph_query" not in st.session_state:
+    st.session_state.graph_query = None
+if "case_page" not in st.session_state:
+    st.session_state.case_page = None
 
 # =====================================================================================
 # --- PAGE 1: LIVE TRANSACTION ANALYSIS ---
@@ -89,87 +337,34 @@ if page == "Live Transaction Analysis":
         st.header("Graph Investigation 🌐")
         with st.form("graph_form"):
             account_id_to_investigate = st.text_input("Account ID to Investigate", placeholder="e.g., 8799")
+            edge_limit = st.number_input(
+                "Max edges drawn", min_value=10, max_value=GRAPH_MAX_EDGE_LIMIT, value=GRAPH_EDGE_LIMIT, step=50,
+                help="Larger neighbourhoods are pruned to the highest-value edges; cycle edges are always kept."
+            )
             graph_submitted = st.form_submit_button("Investigate Account")
 
         if graph_submitted and account_id_to_investigate:
+            # Kept across reruns, so other widgets don't clear the graph
+            st.session_state.graph_query = (account_id_to_investigate.strip(), int(edge_limit))
+
+        if st.session_state.graph_query:
+            account_id, limit = st.session_state.graph_query
             try:
-                graph_response = requests.get(f"{GRAPH_API_URL}{account_id_to_investigate}")
-                graph_response.raise_for_status()
-                graph_data = graph_response.json()
-                nodes = graph_data.get("nodes", [])
-                edges = graph_data.get("edges", [])
-                if not nodes:
+                graph_data = fetch_graph(account_id, limit)
+                if "error" in graph_data:
+                    st.error(graph_data["error"])
+                elif not graph_data["nodes"]["id"]:
                     st.warning("No transaction data found for this account.")
                 else:
-                    # Create a network graph visualization
-                    G = nx.DiGraph()
-                    
-                    # Add nodes and edges
-                    for node in nodes:
-                        G.add_node(node["id"])
-                    
-                    for edge in edges:
-                        G.add_edge(edge["source"], edge["target"], label=edge["label"])
-                    
-                    # Create positions for nodes using spring layout
-                    pos = nx.spring_layout(G)
-                    
-                    # Create plotly figure
-                    fig = go.Figure()
-                    
-                    # Add edges as annotations
-                    for edge in G.edges(data=True):
-                        source, target, data = edge
-                        x0, y0 = pos[source]
-                        x1, y1 = pos[target]
-                        
-                        fig.add_trace(
-                            go.Scatter(
-                                x=[x0, x1, None],
-                                y=[y0, y1, None],
-                                mode="lines+text",
-                                line=dict(width=1, color="blue"),
-                                text=["", data.get("label", "")],
-                                textposition="middle center",
-                                hoverinfo="none"
-                            )
-                        )
-                    
-                    # Add nodes
-                    node_x = []
-                    node_y = []
-                    node_text = []
-                    for node in G.nodes():
-                        x, y = pos[node]
-                        node_x.append(x)
-                        node_y.append(y)
-                        node_text.append(str(node))
-                    
-                    fig.add_trace(
-                        go.Scatter(
-                            x=node_x,
-                            y=node_y,
-                            mode="markers+text",
-                            marker=dict(
-                                size=25, 
-                                color=["red" if node == account_id_to_investigate else "skyblue" for node in G.nodes()]
-                            ),
-                            text=node_text,
-                            textposition="middle center",
-                            hoverinfo="text"
+                    summary = graph_data["summary"]
+                    if summary["edges_truncated"]:
+                        st.caption(
+                            f"Showing the top {summary['returned_edges']:,} of {summary['total_edges']:,} "
+                            f"counterparty edges ({summary['total_nodes']:,} accounts in the neighbourhood)."
                         )
-                    )
-                    
-                    fig.update_layout(
-                        title=f"Transaction Network for Account {account_id_to_investigate}",
-                        showlegend=False,
-                        margin=dict(l=0, r=0, b=0, t=40),
-                        height=500
-                    )
-                    
-                    # Display the graph
+                    fig = build_graph_figure(graph_data, account_id)
                     st.plotly_chart(fig, use_container_width=True)
-                    
+
                     # Display any detected circular patterns
                     circular_patterns = graph_data.get("patterns", {}).get("circular_transfers", [])
                     if circular_patterns:
@@ -187,23 +382,54 @@ if page == "Live Transaction Analysis":
 elif page == "Case Management":
     st.title("Case Management Queue ⚖️")
     
+    # --- Filters and keyset pagination state ---
+    f1, f2 = st.columns(2)
+    with f1:
+        status_filter = st.selectbox("Status", ["All"] + CASE_STATUSES)
+    with f2:
+        min_risk = st.slider("Minimum Risk Score", 0.0, 1.0, 0.0, 0.05)
+
+    filters = (status_filter, min_risk)
+    if st.session_state.get("case_filters") != filters:
+        # New filters start again from the first page
+        st.session_state.case_filters = filters
+        st.session_state.case_cursors = [None]
+
     try:
-        response = requests.get(CASES_API_URL)
-        response.raise_for_status()
-        cases = response.json()
-        
-        if not cases:
-            st.info("No cases found.")
-        else:
-            df_cases = pd.DataFrame(cases)
-            st.write("All open and reviewed cases:")
-            st.dataframe(df_cases[['_id', 'status', 'risk_score', 'created_at']])
-            
+        params = {"limit": CASES_PAGE_SIZE}
+        if status_filter != "All":
+            params["status"] = status_filter
+        if min_risk > 0:
+            params["min_risk_score"] = min_risk
+        if st.session_state.case_cursors[-1]:
+            params["cursor"] = st.session_state.case_cursors[-1]
+
+        # Syncs the page, then keeps it current between reruns
+        live_case_table(params)
+        cases = st.session_state.case_page["cases"]
+        next_cursor = st.session_state.case_page["next_cursor"]
+
+        p1, p2, p3 = st.columns([1, 1, 4])
+        with p1:
+            if st.button("← Previous", disabled=len(st.session_state.case_cursors) == 1):
+                st.session_state.case_cursors.pop()
+                st.rerun()
+        with p2:
+            if st.button("Next →", disabled=not next_cursor):
+                st.session_state.case_cursors.append(next_cursor)
+                st.rerun()
+        with p3:
+            st.caption(f"Page {len(st.session_state.case_cursors)}")
+
+        if cases:
             case_ids = [""] + [case['_id'] for case in cases]
             selected_case_id = st.selectbox("Select a Case ID to review:", case_ids)
             
             if selected_case_id:
-                selected_case = next((case for case in cases if case['_id'] == selected_case_id), None)
+                # The list view only carries summary fields; fetch the full case
+                case_response = requests.get(f"{CASES_API_URL}/{selected_case_id}")
+                case_response.raise_for_status()
+                selected_case = case_response.json()
                 
                 st.subheader(f"Reviewing Case: {selected_case_id}")
                 c1, c2 = st.columns(2)
@@ -220,9 +446,8 @@ elif page == "Case Management":
                     current_notes = selected_case.get('notes', '')
                     notes = st.text_area("Investigator Notes", value=current_notes)
                     
-                    statuses = ["Open", "In Review", "Escalated", "Closed - False Positive"]
-                    current_status_index = statuses.index(selected_case['status']) if selected_case['status'] in statuses else 0
-                    status = st.selectbox("Case Status", options=statuses, index=current_status_index)
+                    current_status_index = CASE_STATUSES.index(selected_case['status']) if selected_case['status'] in CASE_STATUSES else 0
+                    status = st.selectbox("Case Status", options=CASE_STATUSES, index=current_status_index)
                     
                     update_submitted = st.form_submit_button("Save Updates")
 
@@ -232,7 +457,9 @@ elif page == "Case Management":
                             update_response = requests.put(f"{CASES_API_URL}/{selected_case_id}", json=update_payload)
                             update_response.raise_for_status()
                             st.success("Case updated successfully!")
-                            # --- THIS IS THE FIX ---
+                            # Show the new status now; the feed event that follows is a no-op
+                            summary = {field: selected_case[field] for field in ("_id", "risk_score", "created_at", "updated_at")}
+                            apply_case_change(st.session_state.case_page, {**summary, "status": status})
                             st.rerun() # Rerun to show updated table
                         except requests.exceptions.RequestException as e:
                             st.error(f"Failed to update case: {e}")
@@ -0,0 +1,60 @@
+# tests/test_account_features.py
+import numpy as np
+import pytest
+
+from backend.account_features import FEATURES, RECENT_HALF_LIFE, AccountFeatureStore
+
+
+def transactions(seed, rows=2000, accounts=300):
+    rng = np.random.default_rng(seed)
+    senders = rng.integers(0, accounts, rows)
+    receivers = rng.integers(0, accounts, rows)
+    amounts = rng.uniform(1.0, 5000.0, rows).round(2)
+    # Several half-lives, so the recent sums really decay
+    timestamps = rng.integers(0, 8 * RECENT_HALF_LIFE, rows)
+    return senders, receivers, amounts, timestamps
+
+
+def assert_same_features(store, expected, account_ids):
+    for account_id in account_ids:
+        got, want = store.lookup(account_id), expected.lookup(account_id)
+        assert got.keys() == want.keys() == set(FEATURES)
+        for name in FEATURES:
+            assert got[name] == pytest.approx(want[name], rel=1e-9, abs=1e-6), (account_id, name)
+
+
+# Small IDs use the dense slot table, spread-out ones the dict
+@pytest.mark.parametrize("id_scale", [1, 1_000_003])
+def test_records_after_a_build_match_a_full_build(id_scale):
+    senders, receivers, amounts, timestamps = transactions(seed=7)
+    senders, receivers = senders * id_scale, receivers * id_scale
+    split = len(senders) // 2
+    # Accounts that only show up after the build get new slots
+    receivers[split::50] = (1000 + np.arange(len(receivers[split::50]))) * id_scale
+
+    store = AccountFeatureStore.build(senders[:split], receivers[:split], amounts[:split], timestamps[:split])
+    seen = set(zip(senders[:split].tolist(), receivers[:split].tolist()))
+    # Ingested out of time order, as transactions arriving late are
+    for row in np.random.default_rng(1).permutation(np.arange(split, len(senders))):
+        pair = (int(senders[row]), int(receivers[row]))
+        store.record(*pair, float(amounts[row]), pair not in seen, int(timestamps[row]))
+        seen.add(pair)
+
+    expected = AccountFeatureStore.build(senders, receivers, amounts, timestamps)
+    assert store.clock == expected.clock
+    assert store.now == expected.now
+    assert len(store) == len(expected)
+    assert_same_features(store, expected, np.union1d(senders, receivers))
+
+
+def test_records_into_an_empty_store_match_a_build():
+    senders, receivers, amounts, timestamps = transactions(seed=3, rows=500, accounts=40)
+    store = AccountFeatureStore.build([], [], [], [])
+    seen = set()
+    for sender, receiver, amount, timestamp in zip(senders.tolist(), receivers.tolist(),
+                                                   amounts.tolist(), timestamps.tolist()):
+        store.record(sender, receiver, amount, (sender, receiver) not in seen, timestamp)
+        seen.add((sender, receiver))
+
+    expected = AccountFeatureStore.build(senders, receivers, amounts, timestamps)
+    assert_same_features(store, expected, np.union1d(senders, receivers))
@@ -0,0 +1,47 @@
+# tests/test_case_events.py
+from backend.case_events import CaseEventBus
+
+
+def publish(bus, count):
+    for _ in range(count):
+        bus.publish("created", {"_id": str(bus.seq)})
+
+
+def test_since_current_id_is_empty():
+    bus = CaseEventBus()
+    publish(bus, 3)
+    assert bus.since(bus.event_id()) == []
+
+
+def test_since_replays_missed_events_in_order():
+    bus = CaseEventBus()
+    publish(bus, 2)
+    seen = bus.event_id()
+    publish(bus, 3)
+    replay = bus.since(seen)
+    assert [event["seq"] for event in replay] == [3, 4, 5]
+    assert [event["case"]["_id"] for event in replay] == ["2", "3", "4"]
+
+
+def test_since_from_the_start_of_a_boot():
+    bus = CaseEventBus()
+    publish(bus, 2)
+    assert [event["seq"] for event in bus.since(bus.event_id(0))] == [1, 2]
+
+
+def test_since_rejects_ids_it_cannot_replay():
+    bus = CaseEventBus(history=2)
+    publish(bus, 5)
+    assert bus.since(CaseEventBus().event_id()) is None  # another boot
+    assert bus.since(f"{bus.boot}-x") is None  # malformed
+    assert bus.since(bus.event_id(9)) is None  # ahead of the bus
+    assert bus.since(bus.event_id(1)) is None  # older than the buffer
+    assert [event["seq"] for event in bus.since(bus.event_id(3))] == [4, 5]
+
+
+def test_overflowing_subscriber_is_dropped():
+    bus = CaseEventBus(queue_size=1)
+    subscription = bus.subscribe()
+    publish(bus, 2)
+    assert subscription.overflowed
+    assert bus.subscribers() == 0
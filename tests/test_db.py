@@ -0,0 +1,81 @@
+# tests/test_db.py
+import asyncio
+import datetime
+
+import mongomock_motor
+import pytest
+from bson import ObjectId
+
+from backend import db
+
+
+@pytest.fixture
+def cases(monkeypatch):
+    collection = mongomock_motor.AsyncMongoMockClient().aml_system.cases
+    monkeypatch.setattr(db, "case_collection", collection)
+    return collection
+
+
+def insert(collection, documents):
+    asyncio.run(collection.insert_many(documents))
+
+
+def page_through(limit, **filters):
+    ids, cursor = [], None
+    while True:
+        page = asyncio.run(db.get_cases_page(limit=limit, cursor=cursor, **filters))
+        ids.extend(case["_id"] for case in page["cases"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def case(created_at, status="open", risk_score=0.9):
+    return {"_id": ObjectId(), "created_at": created_at, "updated_at": created_at,
+            "status": status, "risk_score": risk_score}
+
+
+def test_pages_cover_every_case_once_newest_first(cases):
+    start = datetime.datetime(2024, 1, 1)
+    documents = [case(start + datetime.timedelta(minutes=i)) for i in range(7)]
+    # Cases created in the same instant are ordered by _id
+    same_time = start + datetime.timedelta(hours=1)
+    documents += [case(same_time) for _ in range(4)]
+    insert(cases, documents)
+
+    expected = [str(doc["_id"]) for doc in sorted(documents, key=lambda d: (d["created_at"], d["_id"]), reverse=True)]
+    for limit in (1, 2, 3, 11, 50):
+        assert page_through(limit) == expected
+
+
+def test_cursor_is_stable_when_newer_cases_arrive(cases):
+    start = datetime.datetime(2024, 1, 1)
+    documents = [case(start + datetime.timedelta(minutes=i)) for i in range(6)]
+    insert(cases, documents)
+    first = asyncio.run(db.get_cases_page(limit=3))
+    insert(cases, [case(start + datetime.timedelta(days=1))])
+    second = asyncio.run(db.get_cases_page(limit=3, cursor=first["next_cursor"]))
+    assert [c["_id"] for c in second["cases"]] == [str(d["_id"]) for d in documents[2::-1]]
+
+
+def test_filters_apply_across_pages(cases):
+    start = datetime.datetime(2024, 1, 1)
+    documents = [case(start + datetime.timedelta(minutes=i), status="open" if i % 2 else "closed",
+                      risk_score=i / 10) for i in range(10)]
+    insert(cases, documents)
+    expected = [str(d["_id"]) for d in reversed(documents) if d["status"] == "open" and d["risk_score"] >= 0.4]
+    assert page_through(2, status="open", min_risk_score=0.4) == expected
+
+
+def test_summary_view_leaves_out_heavy_fields(cases):
+    document = case(datetime.datetime(2024, 1, 1))
+    document["explanation"] = {"amount": 0.5}
+    insert(cases, [document])
+    summary = asyncio.run(db.get_cases_page())["cases"][0]
+    assert "explanation" not in summary
+    assert "explanation" in asyncio.run(db.get_cases_page(summary=False))["cases"][0]
+
+
+def test_malformed_cursor_is_rejected(cases):
+    with pytest.raises(Exception):
+        asyncio.run(db.get_cases_page(cursor="not-a-cursor"))
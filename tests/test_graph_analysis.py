@@ -0,0 +1,106 @@
+# tests/test_graph_analysis.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend import graph_analysis
+from backend.graph_analysis import analyze_account_graph, is_time_respecting
+
+
+def times_from(transfers):
+    return lambda u, v: np.sort(np.asarray(transfers.get((u, v), []), dtype=np.int64))
+
+
+@pytest.mark.parametrize("transfers, expected", [
+    ({(1, 2): [10], (2, 3): [20], (3, 1): [30]}, True),
+    # Money can enter the loop at any account
+    ({(1, 2): [30], (2, 3): [10], (3, 1): [20]}, True),
+    ({(1, 2): [30], (2, 3): [20], (3, 1): [10]}, False),
+    # Transfers at the same second can follow each other
+    ({(1, 2): [5], (2, 3): [5], (3, 1): [5]}, True),
+    # A later transfer of the same pair can close the loop
+    ({(1, 2): [200, 400], (2, 3): [100], (3, 1): [300]}, True),
+    ({(1, 2): [10], (2, 3): [], (3, 1): [30]}, False),
+])
+def test_is_time_respecting(transfers, expected):
+    assert is_time_respecting([1, 2, 3], times_from(transfers)) is expected
+
+
+@pytest.fixture
+def load_transactions(tmp_path, monkeypatch):
+    """Returns a function that loads (sender, receiver, amount, timestamp) rows as the graph."""
+    # Restored after the test, so other tests see whatever graph was loaded before
+    for name in ("senders", "receivers", "amounts", "timestamps", "features", "_log_path", "_log_records"):
+        monkeypatch.setattr(graph_analysis, name, getattr(graph_analysis, name))
+    monkeypatch.setattr(graph_analysis, "index", None)
+    monkeypatch.setattr(graph_analysis, "STORE_PATH", None)
+    monkeypatch.setattr(graph_analysis, "INGEST_LOG", False)
+
+    def load(transactions):
+        path = tmp_path / "transactions.csv"
+        pd.DataFrame(transactions, columns=[
+            "sender_account_id", "receiver_account_id", "amount", "timestamp"
+        ]).to_csv(path, index=False)
+        monkeypatch.setattr(graph_analysis, "DATA_PATH", str(path))
+        graph_analysis.load_graph()
+    return load
+
+
+@pytest.fixture
+def small_graph(load_transactions):
+    """Loads a four-transfer graph: 1 -> 2 at 200 and 400, 2 -> 3 at 100, 3 -> 1 at 300."""
+    load_transactions([(1, 2, 10.0, 200), (2, 3, 20.0, 100), (3, 1, 30.0, 300), (1, 2, 40.0, 400)])
+
+
+def cycles(**params):
+    # Two hops from account 1 reach every edge of the loop
+    return analyze_account_graph(1, depth=2, **params)["patterns"]["circular_transfers"]
+
+
+def test_cycle_found_over_all_time(small_graph):
+    assert cycles() == [[1, 2, 3]]
+
+
+def test_window_that_drops_the_closing_transfer_is_not_time_respecting(small_graph):
+    # Without the transfer at 400 the loop can't be walked in order
+    assert cycles(end=350) == []
+    assert cycles(end=350, time_respecting=False) == [[1, 2, 3]]
+
+
+def test_window_that_drops_an_edge_has_no_cycle(small_graph):
+    assert cycles(start=150, time_respecting=False) == []
+
+
+def test_window_bounds_are_inclusive(small_graph):
+    assert cycles(start=100, end=400) == [[1, 2, 3]]
+    assert analyze_account_graph(1, start=100, end=100)["summary"]["transactions"] == 0
+    assert analyze_account_graph(2, start=100, end=100)["summary"]["transactions"] == 1
+
+
+def edge_pairs(result):
+    return {(int(edge["source"]), int(edge["target"])) for edge in result["edges"]}
+
+
+@pytest.mark.parametrize("rank_by", ["amount", "degree"])
+def test_pruning_keeps_every_cycle_edge(load_transactions, rank_by):
+    # A loop of small transfers among forty large payments out of account 1
+    loop = [(1, 2, 1.0, 10), (2, 3, 1.0, 20), (3, 1, 1.0, 30)]
+    payments = [(1, 100 + i, 1000.0 + i, 40 + i) for i in range(40)]
+    load_transactions(loop + payments)
+    result = analyze_account_graph(1, depth=2, limit=2, rank_by=rank_by)
+    assert result["patterns"]["circular_transfers"] == [[1, 2, 3]]
+    assert {(1, 2), (2, 3), (3, 1)} <= edge_pairs(result)
+    assert result["summary"]["edges_truncated"]
+    assert result["summary"]["limit_exceeded"]
+
+
+@pytest.mark.parametrize("rank_by", ["amount", "degree"])
+def test_pruning_keeps_the_queried_account(load_transactions, rank_by):
+    # Account 50's only transfer is the smallest edge two hops out
+    payments = [(2, 200 + i, 1000.0 + i, i) for i in range(40)]
+    load_transactions([(50, 2, 0.5, 100)] + payments)
+    result = analyze_account_graph(50, depth=2, limit=5, rank_by=rank_by)
+    assert result["summary"]["total_edges"] == 41
+    assert result["summary"]["returned_edges"] <= 6
+    assert "50" in {node["id"] for node in result["nodes"]}
+    assert (50, 2) in edge_pairs(result)
@@ -0,0 +1,62 @@
+# tests/test_graph_cache.py
+from backend.graph_cache import GraphResultCache, INVALIDATION_LOG_SIZE
+
+
+def test_hit_after_put():
+    cache = GraphResultCache()
+    assert cache.put("key", b"body", {1, 2}, cache.epoch())
+    assert cache.get("key") == b"body"
+    assert cache.stats()["hits"] == 1
+
+
+def test_invalidate_drops_entries_with_the_account():
+    cache = GraphResultCache()
+    cache.put("a", b"a", {1, 2}, cache.epoch())
+    cache.put("b", b"b", {3}, cache.epoch())
+    assert cache.invalidate({2}) == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == b"b"
+
+
+def test_put_skipped_when_an_account_was_invalidated_meanwhile():
+    cache = GraphResultCache()
+    epoch = cache.epoch()
+    cache.invalidate({2})
+    assert not cache.put("key", b"stale", {1, 2}, epoch)
+    assert cache.get("key") is None
+
+
+def test_put_kept_when_invalidations_meanwhile_are_disjoint():
+    cache = GraphResultCache()
+    epoch = cache.epoch()
+    cache.invalidate({5})
+    assert cache.put("key", b"body", {1, 2}, epoch)
+
+
+def test_put_skipped_once_the_log_no_longer_reaches_its_epoch():
+    cache = GraphResultCache()
+    epoch = cache.epoch()
+    for account in range(INVALIDATION_LOG_SIZE + 1):
+        cache.invalidate({1000 + account})
+    assert not cache.put("key", b"body", {1, 2}, epoch)
+
+
+def test_put_skipped_after_clear():
+    cache = GraphResultCache()
+    epoch = cache.epoch()
+    cache.clear()
+    assert not cache.put("key", b"body", {1}, epoch)
+
+
+def test_invalidate_nothing_keeps_the_epoch():
+    cache = GraphResultCache()
+    epoch = cache.epoch()
+    assert cache.invalidate(set()) == 0
+    assert cache.epoch() == epoch
+
+
+def test_expired_entry_is_a_miss():
+    cache = GraphResultCache(ttl=-1)
+    cache.put("key", b"body", {1}, cache.epoch())
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,92 @@
+# tests/test_graph_index.py
+import numpy as np
+import pytest
+
+from backend.graph_index import AdjacencyIndex
+
+ROWS = 3000
+BUILT = 2000  # rows indexed by the build; the rest are added afterwards
+
+
+@pytest.fixture(scope="module")
+def columns():
+    rng = np.random.default_rng(11)
+    senders = rng.integers(0, 60, ROWS)
+    receivers = rng.integers(0, 60, ROWS)
+    # Few distinct times, so accounts have ties and windows end on exact timestamps
+    timestamps = rng.integers(0, 200, ROWS) * 10
+    return senders, receivers, timestamps
+
+
+@pytest.fixture(scope="module")
+def index(columns):
+    senders, receivers, timestamps = columns
+    index = AdjacencyIndex(senders[:BUILT], receivers[:BUILT], timestamps[:BUILT])
+    for row in range(BUILT, ROWS):
+        index.add(row, senders[row], receivers[row], int(timestamps[row]))
+    return index
+
+
+def brute_force(column, timestamps, account_id, start, end):
+    inside = column == account_id
+    if start is not None:
+        inside &= timestamps >= start
+    if end is not None:
+        inside &= timestamps <= end
+    return np.flatnonzero(inside)
+
+
+WINDOWS = [(None, None), (500, None), (None, 500), (500, 1200), (700, 700), (705, 709), (1200, 500), (-5, 5000)]
+
+
+@pytest.mark.parametrize("start, end", WINDOWS)
+@pytest.mark.parametrize("direction", ["outgoing", "incoming"])
+def test_window_lookups_match_a_scan(columns, index, direction, start, end):
+    senders, receivers, timestamps = columns
+    column = senders if direction == "outgoing" else receivers
+    for account_id in range(-1, 62):
+        rows = getattr(index, direction)(account_id, start, end)
+        expected = brute_force(column, timestamps, account_id, start, end)
+        assert np.array_equal(np.sort(rows), expected), (direction, account_id)
+        assert len(np.unique(rows)) == len(rows)
+
+
+@pytest.mark.parametrize("start, end", WINDOWS)
+def test_built_lookups_match_a_scan(columns, start, end):
+    senders, receivers, timestamps = columns
+    index = AdjacencyIndex(senders, receivers, timestamps)
+    for account_id in range(60):
+        for rows, column in ((index.outgoing(account_id, start, end), senders),
+                             (index.incoming(account_id, start, end), receivers)):
+            assert np.array_equal(np.sort(rows), brute_force(column, timestamps, account_id, start, end))
+            # Built rows come back in time order
+            assert np.all(np.diff(timestamps[rows]) >= 0)
+
+
+def test_appended_rows_follow_the_indexed_ones(columns, index):
+    senders, _, timestamps = columns
+    for account_id in range(60):
+        rows = index.outgoing(account_id)
+        indexed, appended = rows[rows < BUILT], rows[rows >= BUILT]
+        assert np.array_equal(rows, np.concatenate([indexed, appended]))
+        assert np.all(np.diff(timestamps[indexed]) >= 0)
+        assert np.all(np.diff(appended) > 0)
+
+
+def test_edge_rows_and_accounts(columns, index):
+    senders, receivers, timestamps = columns
+    for account_id in (0, 17, 59):
+        expected = np.union1d(brute_force(senders, timestamps, account_id, 300, 900),
+                              brute_force(receivers, timestamps, account_id, 300, 900))
+        assert np.array_equal(index.edge_rows(account_id, 300, 900), expected)
+    assert np.array_equal(index.accounts(), np.union1d(senders, receivers))
+
+
+def test_saved_index_answers_the_same(columns, tmp_path):
+    senders, receivers, timestamps = columns
+    built = AdjacencyIndex(senders, receivers, timestamps)
+    built.save(tmp_path)
+    loaded = AdjacencyIndex.load(tmp_path)
+    for account_id in range(60):
+        assert np.array_equal(loaded.outgoing(account_id, 400, 1500), built.outgoing(account_id, 400, 1500))
+        assert np.array_equal(loaded.incoming(account_id, 400, 1500), built.incoming(account_id, 400, 1500))
@@ -0,0 +1,47 @@
+# tests/test_startup.py
+"""Boots the API the way uvicorn does and checks it serves its first request in time."""
+import os
+import subprocess
+import sys
+import time
+
+import mongomock_motor
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import db, graph_analysis, main
+from backend.model_registry import MODEL_PATH
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup returns at once and the first /predict waits for the warm-up
+# (explainer, graph, worker pool). The pool's workers import the backend in
+# fresh interpreters, so the cold start is bounded in units of that import:
+# about 1.2 of them when measured, the rest is loading the model and data.
+FIRST_REQUEST_IMPORTS = 2.0
+
+
+def import_seconds():
+    """How long a fresh interpreter takes to import the API."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import backend.main"], cwd=ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+@pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="no trained model")
+def test_first_request_succeeds_within_bound(monkeypatch):
+    monkeypatch.setattr(db, "case_collection", mongomock_motor.AsyncMongoMockClient().aml_system.cases)
+    # Keep the API and its spawned workers from creating an ingest log next to the data
+    monkeypatch.setattr(graph_analysis, "INGEST_LOG", False)
+    monkeypatch.setenv("INGEST_LOG", "0")
+    start = time.perf_counter()
+    with TestClient(main.app) as client:
+        response = client.post("/predict", json={"amount": 100.0, "sender_account_age": 30, "receiver_account_age": 400})
+        elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    body = response.json()
+    assert "error" not in body
+    assert 0.0 <= body["fraud_probability"] <= 1.0
+    assert set(body["explanation"]) == {"amount", "sender_account_age", "receiver_account_age"}
+    # Measured afterwards, so the cold start got no help from warmed file caches
+    assert elapsed < FIRST_REQUEST_IMPORTS * import_seconds()